@@ -13,6 +13,14 @@ class TaskVersionAdmin(admin.ModelAdmin):
     pass
 
 
+class TaskHistoryAdmin(admin.ModelAdmin):
+    list_display = ["task", "sequence", "created_at"]
+
+
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ["event", "task", "created_at", "dispatched_at"]
+
+
 class ObjectAdmin(admin.ModelAdmin):
     list_display = ["name"]
 
@@ -31,6 +39,8 @@ class TypeQualityAdmin(admin.ModelAdmin):
 
 admin.site.register(models.Task, TaskAdmin)
 admin.site.register(models.TaskVersion, TaskVersionAdmin)
+admin.site.register(models.TaskHistory, TaskHistoryAdmin)
+admin.site.register(models.NotificationOutbox, NotificationOutboxAdmin)
 admin.site.register(models.Object, ObjectAdmin)
 admin.site.register(models.Status, StatusAdmin)
 admin.site.register(models.Priority, PriorityAdmin)
@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ItsRegions2025Config(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'its_regions_2025'
+
+    def ready(self):
+        import its_regions_2025.signals  # noqa: F401
+
+        if settings.RECOMMENDATION_PRELOAD:
+            from its_regions_2025.recommendations import get_engine
+
+            get_engine().preload()
@@ -0,0 +1,65 @@
+import copy
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+from its_regions_2025.cache import LRUCache
+
+_local_cache = None
+
+
+def _cache_key(key):
+    # Сам токен в ключ кэша не попадает
+    return "auth-token:" + hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def get_token_cache():
+    """
+    Кэш токенов: общий кэш Django при TOKEN_CACHE_ALIAS, иначе LRU процесса
+    """
+    global _local_cache
+    if settings.TOKEN_CACHE_ALIAS:
+        return caches[settings.TOKEN_CACHE_ALIAS]
+    if _local_cache is None:
+        _local_cache = LRUCache(
+            maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.TOKEN_CACHE_TTL
+        )
+    return _local_cache
+
+
+def _snapshot(user, token):
+    # Объекты в памяти процесса не должны разделяться между запросами
+    user, token = copy.copy(user), copy.copy(token)
+    token.user = user
+    return user, token
+
+
+def invalidate_token(key):
+    get_token_cache().delete(_cache_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Аутентификация по токену DRF с кэшем: токен -> (пользователь, токен).
+
+    Запись живет не дольше TOKEN_CACHE_TTL секунд и сбрасывается сигналами
+    при удалении токена (выход) и изменении пользователя.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        cache_key = _cache_key(key)
+        local = isinstance(cache, LRUCache)
+
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return _snapshot(*cached) if local else cached
+
+        user, token = super().authenticate_credentials(key)
+        if local:
+            cache.set(cache_key, _snapshot(user, token))
+        else:
+            cache.set(cache_key, (user, token), settings.TOKEN_CACHE_TTL)
+        return user, token
@@ -0,0 +1,84 @@
+import hashlib
+
+from django.db.models import Count, Max
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def etag_matches(request, etag):
+    header = request.META.get("HTTP_IF_NONE_MATCH", "")
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def make_etag(*parts):
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode("utf-8"))
+    return f'"{digest.hexdigest()[:16]}"'
+
+
+class ConditionalMixin:
+    """
+    Условные GET-запросы для list и retrieve.
+
+    Валидатор считается одним запросом без сериализации: число строк и
+    максимальный updated_at выборки (для retrieve - updated_at объекта).
+    При постраничной выдаче по ключу валидатор - id и updated_at строк
+    страницы, без агрегата по всей выборке. В ETag входят также пользователь
+    и полный путь запроса, так как выборка и параметры ответа зависят от
+    них. При совпадении с If-None-Match возвращается 304.
+    """
+
+    def get_etag_extra(self):
+        """
+        Дополнительное состояние, от которого зависит ответ
+        """
+        return ""
+
+    def list_validator(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = None
+        if hasattr(self.paginator, "page_queryset"):
+            page = self.paginator.page_queryset(queryset, self.request)
+        if page is not None:
+            # Строка после страницы входит в выборку: от нее зависит ссылка next
+            return tuple(page.values_list("pk", "updated_at"))
+
+        queryset = queryset.order_by()
+        aggregate = queryset.aggregate(count=Count("pk"), last=Max("updated_at"))
+        return aggregate["count"], aggregate["last"]
+
+    def retrieve_validator(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        return queryset.values_list("updated_at", flat=True).first()
+
+    def conditional_response(self, validator, render, request, *args, **kwargs):
+        etag = make_etag(
+            request.user.pk,
+            request.get_full_path(),
+            *validator,
+            self.get_etag_extra(),
+        )
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = render(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response["ETag"] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.list_validator(), super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        updated_at = self.retrieve_validator()
+        if updated_at is None:
+            # Объекта нет или он недоступен: ответ без валидатора (404)
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(
+            (updated_at,), super().retrieve, request, *args, **kwargs
+        )
@@ -0,0 +1,36 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from its_regions_2025.events import user_group
+
+
+class UpdatesConsumer(AsyncJsonWebsocketConsumer):
+    """
+    WebSocket пользователя: новые уведомления и изменения его задач.
+
+    Каждое подключение входит в группу пользователя, события отправляются
+    в группу из events.push.
+    """
+
+    group = None
+
+    async def connect(self):
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+
+        self.group = user_group(user.pk)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if self.group is not None:
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        # Клиент может проверять соединение сообщением {"type": "ping"}
+        if content.get("type") == "ping":
+            await self.send_json({"type": "pong"})
+
+    async def push_event(self, event):
+        await self.send_json(event["payload"])
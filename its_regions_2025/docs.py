@@ -1,7 +1,9 @@
 from drf_spectacular.utils import (
     extend_schema,
+    inline_serializer,
     OpenApiParameter,
 )
+from rest_framework import serializers
 
 
 class TypeObjectDocumentation:
@@ -200,7 +202,27 @@ class TaskDocumentation:
     def __new__(cls):
         tag = "Задачи"
         return {
-            "list": extend_schema(tags=[tag], description="Получить список всех задач"),
+            "list": extend_schema(
+                tags=[tag],
+                parameters=[
+                    OpenApiParameter(
+                        name="include",
+                        description="recommendation - добавить рекомендации "
+                        "отчетов к задачам в статусе 2",
+                        required=False,
+                        type=str,
+                        location=OpenApiParameter.QUERY,
+                    ),
+                    OpenApiParameter(
+                        name="fields",
+                        description="Поля задачи через запятую: id,name,status",
+                        required=False,
+                        type=str,
+                        location=OpenApiParameter.QUERY,
+                    ),
+                ],
+                description="Получить список всех задач",
+            ),
             "retrieve": extend_schema(
                 tags=[tag],
                 parameters=[
@@ -222,6 +244,63 @@ class TaskDocumentation:
                 tags=[tag],
                 description="Частично обновить существующую задачу по идентификатору",
             ),
+            "versions": extend_schema(
+                tags=[tag],
+                parameters=[
+                    OpenApiParameter(
+                        name="id",
+                        description="Идентификатор задачи",
+                        required=True,
+                        type=int,
+                        location=OpenApiParameter.PATH,
+                    )
+                ],
+                operation_id="api_v1_data_tasks_versions_grouped",
+                description="Получить версии задачи, сгруппированные по version_uuid",
+            ),
+        }
+
+
+class TaskVersionDocumentation:
+    def __new__(cls):
+        tag = "Версии задач"
+        return {
+            "list": extend_schema(
+                tags=[tag], description="Получить список всех версий задач"
+            ),
+            "retrieve": extend_schema(
+                tags=[tag],
+                parameters=[
+                    OpenApiParameter(
+                        name="id",
+                        description="Идентификатор версии",
+                        required=True,
+                        type=int,
+                        location=OpenApiParameter.PATH,
+                    )
+                ],
+                description="Получить конкретную версию по идентификатору",
+            ),
+            "as_of": extend_schema(
+                tags=[tag],
+                parameters=[
+                    OpenApiParameter(
+                        name="task",
+                        description="Идентификатор задачи",
+                        required=True,
+                        type=int,
+                        location=OpenApiParameter.QUERY,
+                    ),
+                    OpenApiParameter(
+                        name="at",
+                        description="Момент времени в формате ISO 8601",
+                        required=True,
+                        type=str,
+                        location=OpenApiParameter.QUERY,
+                    ),
+                ],
+                description="Получить состояние задачи на момент времени",
+            ),
         }
 
 
@@ -255,6 +334,28 @@ class NotificationDocumentation:
                 tags=[tag],
                 description="Частично обновить уведомление по идентификатору",
             ),
+            "unread_count": extend_schema(
+                tags=[tag],
+                request=None,
+                responses={
+                    200: inline_serializer(
+                        "UnreadCount", {"unread_count": serializers.IntegerField()}
+                    )
+                },
+                description="Получить количество непрочитанных уведомлений",
+            ),
+            "mark_read": extend_schema(
+                tags=[tag],
+                request=inline_serializer(
+                    "MarkRead", {"up_to": serializers.IntegerField()}
+                ),
+                responses={
+                    200: inline_serializer(
+                        "MarkReadResult", {"updated": serializers.IntegerField()}
+                    )
+                },
+                description="Отметить прочитанными уведомления с id не больше up_to",
+            ),
         }
 
 
@@ -309,4 +410,8 @@ class RecommendationDocumentation:
                 ],
                 description="Получить конкретную задачу по идентификатору",
             ),
+            "stats": extend_schema(
+                tags=[tag],
+                description="Статистика кэша рекомендаций (только для администраторов)",
+            ),
         }
@@ -0,0 +1,71 @@
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+import its_regions_2025.serializers as serializers
+
+logger = logging.getLogger(__name__)
+
+
+def user_group(user_id):
+    """
+    Группа канального слоя с WebSocket-подключениями пользователя
+    """
+    return f"user.{user_id}"
+
+
+def push(user_ids, payload):
+    """
+    Отправка события подключениям пользователей после фиксации транзакции
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if user_ids:
+        transaction.on_commit(lambda: _send(user_ids, payload))
+
+
+def _send(user_ids, payload):
+    layer = get_channel_layer()
+    if layer is None:
+        return
+
+    async def send():
+        for user_id in user_ids:
+            await layer.group_send(
+                user_group(user_id), {"type": "push.event", "payload": payload}
+            )
+
+    try:
+        async_to_sync(send)()
+    except Exception:
+        # Недоступный канальный слой не должен ломать уже выполненный запрос
+        logger.exception("Failed to push %s event", payload.get("type"))
+
+
+def task_created(task, state):
+    push(
+        [task.executor_id, task.creator_id],
+        {"type": "task.created", "task": state},
+    )
+
+
+def task_updated(task, changes, old_executor_id=None):
+    push(
+        [task.executor_id, task.creator_id],
+        {"type": "task.updated", "task": task.id, "changes": changes},
+    )
+    if old_executor_id is not None and old_executor_id != task.executor_id:
+        push([old_executor_id], {"type": "task.removed", "task": task.id})
+
+
+def notification_created(notification):
+    push(
+        [notification.user_id],
+        {
+            "type": "notification.created",
+            "notification": dict(
+                serializers.NotificationSerializer(notification).data
+            ),
+        },
+    )
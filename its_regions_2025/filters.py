@@ -0,0 +1,99 @@
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+class TaskFilterBackend(BaseFilterBackend):
+    """
+    Фильтры списка задач.
+
+    status, priority, object, executor, type_breaking - идентификатор или
+    несколько через запятую; deadline_after, deadline_before - границы срока
+    выполнения (дата или дата и время ISO 8601, включительно).
+    """
+
+    id_filters = {
+        "status": "Статус",
+        "priority": "Приоритет",
+        "object": "Объект",
+        "executor": "Исполнитель",
+        "type_breaking": "Тип поломки",
+    }
+    range_filters = {
+        "deadline_after": ("deadline__gte", "Срок выполнения не раньше"),
+        "deadline_before": ("deadline__lte", "Срок выполнения не позже"),
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        errors = {}
+        conditions = {}
+
+        for name in self.id_filters:
+            value = params.get(name)
+            if not value:
+                continue
+            try:
+                ids = [int(item) for item in value.split(",")]
+            except ValueError:
+                errors[name] = ["Expected an id or comma-separated ids"]
+                continue
+            if len(ids) == 1:
+                conditions[name] = ids[0]
+            else:
+                conditions[f"{name}__in"] = ids
+
+        for name, (lookup, _) in self.range_filters.items():
+            value = params.get(name)
+            if not value:
+                continue
+            moment = self.parse_moment(value, end_of_day=lookup.endswith("lte"))
+            if moment is None:
+                errors[name] = ["Expected an ISO 8601 date or datetime"]
+                continue
+            conditions[lookup] = moment
+
+        if errors:
+            raise ValidationError(errors)
+        return queryset.filter(**conditions)
+
+    def parse_moment(self, value, end_of_day=False):
+        try:
+            # Дата без времени - весь день; parse_datetime принял бы ее за полночь
+            day = parse_date(value)
+            moment = None if day is not None else parse_datetime(value)
+        except ValueError:
+            return None
+        if day is not None:
+            moment = datetime.combine(day, time.max if end_of_day else time.min)
+        if moment is None:
+            return None
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment
+
+    def get_schema_operation_parameters(self, view):
+        parameters = [
+            {
+                "name": name,
+                "required": False,
+                "in": "query",
+                "description": f"{title}: идентификатор или несколько через запятую",
+                "schema": {"type": "string"},
+            }
+            for name, title in self.id_filters.items()
+        ]
+        parameters += [
+            {
+                "name": name,
+                "required": False,
+                "in": "query",
+                "description": title,
+                "schema": {"type": "string", "format": "date-time"},
+            }
+            for name, (_, title) in self.range_filters.items()
+        ]
+        return parameters
@@ -0,0 +1,73 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from its_regions_2025.retention import ARCHIVE, apply_policy, get_policies
+
+
+class Command(BaseCommand):
+    help = "Удаление и архивирование устаревших строк по политикам хранения"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--policy",
+            action="append",
+            dest="policies",
+            help="Применить только эту политику (можно указать несколько раз)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.RETENTION_BATCH_SIZE,
+            help="Количество строк, удаляемых в одной транзакции",
+        )
+        parser.add_argument(
+            "--archive-dir",
+            default=str(settings.RETENTION_ARCHIVE_DIR),
+            help="Каталог для архивов в формате JSONL, сжатых gzip",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только посчитать устаревшие строки",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size <= 0:
+            raise CommandError("--batch-size must be positive")
+
+        policies = get_policies()
+        names = options["policies"] or list(policies)
+        unknown = set(names) - set(policies)
+        if unknown:
+            raise CommandError(f"Unknown policies: {', '.join(sorted(unknown))}")
+
+        now = timezone.now()
+        for name in names:
+            policy = policies[name]
+            if not policy.enabled:
+                continue
+
+            if options["dry_run"]:
+                count = policy.expired(now).count()
+                self.stdout.write(f"{name}: {count} expired rows")
+                continue
+
+            if policy.action == ARCHIVE:
+                count = self.archive(policy, batch_size, options["archive_dir"], now)
+            else:
+                count = apply_policy(policy, batch_size, now=now)
+            self.stdout.write(f"{name}: {count} rows removed")
+
+    def archive(self, policy, batch_size, archive_dir, now):
+        directory = Path(archive_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{policy.name}-{now.strftime('%Y%m%d%H%M%S')}.jsonl.gz"
+        # Файл создается первой зафиксированной порцией
+        count = apply_policy(policy, batch_size, archive=path, now=now)
+        if count:
+            self.stdout.write(f"{policy.name}: archived to {path}")
+        return count
@@ -0,0 +1,140 @@
+import os
+from pathlib import Path
+
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+import its_regions_2025.models as models
+from model.recomendation import QUALITY_COLUMNS, ReportRecommendationModel
+
+# Поля задачи и соответствующие им столбцы корпуса
+TASK_FIELDS = {
+    "id": "task_id",
+    "object__type__name": "type_object",
+    "description": "description",
+    "type_breaking__name": "type_breaking",
+    "text_report": "text_report",
+    "quality_report__name": "quality_report",
+    "diagnostic_data": "diagnostic_data",
+    "was_done": "was_done",
+    "result": "result",
+    "name_component": "name_component",
+}
+
+
+class Command(BaseCommand):
+    help = "Обучение модели рекомендаций на отчетах задач и запись артефакта"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Количество задач, читаемых из базы за один запрос",
+        )
+        parser.add_argument(
+            "--output-dir",
+            default=str(Path(settings.RECOMMENDATION_MODEL_PATH).parent),
+            help="Каталог для версионированных артефактов",
+        )
+        parser.add_argument(
+            "--with-dataset",
+            action="store_true",
+            help="Добавить к отчетам задач исходный корпус parsed_dataset.xlsx",
+        )
+        parser.add_argument(
+            "--format",
+            choices=["joblib", "compact"],
+            default="joblib",
+            help="Формат артефакта: единый joblib-файл или каталог для mmap",
+        )
+        parser.add_argument(
+            "--no-activate",
+            action="store_true",
+            help="Не заменять рабочий артефакт RECOMMENDATION_ACTIVE_PATH",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        if chunk_size <= 0:
+            raise CommandError("--chunk-size must be positive")
+
+        # Отчеты, измененные во время чтения, будут добавлены дельтой
+        built_at = timezone.now()
+        df = self.load_tasks(chunk_size)
+        self.stdout.write(f"Loaded {len(df)} task reports")
+
+        if options["with_dataset"]:
+            dataset = pd.read_excel(
+                Path(settings.BASE_DIR) / "model" / "parsed_dataset.xlsx"
+            )
+            df = pd.concat([dataset, df], ignore_index=True)
+
+        if df.empty:
+            raise CommandError("No reports to train the recommendation model on")
+
+        model = ReportRecommendationModel()
+        model.fit(df)
+        model.built_at = built_at
+        model.version = timezone.now().strftime("%Y%m%d%H%M%S%f")
+
+        output_dir = Path(options["output_dir"])
+        output_dir.mkdir(parents=True, exist_ok=True)
+        if options["format"] == "compact":
+            path = output_dir / f"report_recommendation_model-{model.version}"
+            model.save_compact(str(path))
+        else:
+            path = output_dir / f"report_recommendation_model-{model.version}.joblib"
+            model.save_model(str(path))
+        self.stdout.write(f"Saved artifact {path}")
+
+        if not options["no_activate"]:
+            self.activate(path, Path(settings.RECOMMENDATION_ACTIVE_PATH))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Recommendation model {model.version} built from {len(df)} reports"
+            )
+        )
+
+    def load_tasks(self, chunk_size):
+        """
+        Потоковое чтение отчетов задач без создания экземпляров моделей
+        """
+        rows = (
+            models.Task.objects.exclude(text_report__isnull=True)
+            .exclude(text_report="")
+            .order_by("id")
+            .values_list(*TASK_FIELDS)
+            .iterator(chunk_size=chunk_size)
+        )
+
+        frames = []
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                frames.append(pd.DataFrame(chunk, columns=list(TASK_FIELDS.values())))
+                chunk = []
+        if chunk or not frames:
+            frames.append(pd.DataFrame(chunk, columns=list(TASK_FIELDS.values())))
+
+        df = pd.concat(frames, ignore_index=True)
+        df[QUALITY_COLUMNS] = df[QUALITY_COLUMNS].astype(int)
+        return df
+
+    def activate(self, path, active_path):
+        """
+        Атомарная замена рабочего артефакта заменой символьной ссылки.
+
+        Артефакт из репозитория (RECOMMENDATION_MODEL_PATH) не изменяется.
+        """
+        active_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = active_path.with_name(f".{active_path.name}.tmp")
+        if tmp_path.is_symlink() or tmp_path.exists():
+            tmp_path.unlink()
+        tmp_path.symlink_to(path.resolve(), target_is_directory=path.is_dir())
+        os.replace(tmp_path, active_path)
+        self.stdout.write(f"Activated artifact {active_path}")
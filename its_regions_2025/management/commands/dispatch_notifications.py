@@ -0,0 +1,57 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from its_regions_2025.notifications import check_channel_layer, dispatch_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Рассылка уведомлений из очереди NotificationOutbox. Запускается "
+        "отдельным процессом рядом с ASGI-сервером: "
+        "python manage.py dispatch_notifications --loop"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.NOTIFICATION_DISPATCH_BATCH_SIZE,
+            help="Количество событий, обрабатываемых в одной транзакции",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Работать постоянно, проверяя очередь с интервалом --interval",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.NOTIFICATION_DISPATCH_INTERVAL,
+            help="Пауза в секундах, когда очередь пуста",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size <= 0:
+            raise CommandError("--batch-size must be positive")
+        try:
+            check_channel_layer()
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+
+        while True:
+            total = 0
+            while True:
+                processed = dispatch_batch(batch_size)
+                total += processed
+                if processed < batch_size:
+                    break
+            if total or options["verbosity"] > 1:
+                self.stdout.write(f"Dispatched {total} notification events")
+
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,46 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.exceptions import AuthenticationFailed
+
+from its_regions_2025.authentication import CachedTokenAuthentication
+
+
+def token_from_scope(scope):
+    """
+    Токен из параметра ?token= или заголовка Authorization: Token <key>
+    """
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    if query.get("token"):
+        return query["token"][0]
+
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            parts = value.decode("latin-1").split()
+            if len(parts) == 2 and parts[0].lower() == "token":
+                return parts[1]
+    return None
+
+
+@database_sync_to_async
+def get_token_user(key):
+    if not key:
+        return AnonymousUser()
+    try:
+        user, _ = CachedTokenAuthentication().authenticate_credentials(key)
+    except AuthenticationFailed:
+        return AnonymousUser()
+    return user
+
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """
+    Аутентификация WebSocket-подключений по токену DRF
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        scope["user"] = await get_token_user(token_from_scope(scope))
+        return await super().__call__(scope, receive, send)
@@ -61,6 +61,9 @@ class User(AbstractBaseUser, PermissionsMixin):
         blank=True,
         null=True,
     )
+    updated_at = models.DateTimeField(
+        auto_now=True, db_index=True, verbose_name="Дата изменения"
+    )
 
     objects = CustomUserManager()
 
@@ -73,6 +76,9 @@ class User(AbstractBaseUser, PermissionsMixin):
 
 class TypeObject(models.Model):
     name = models.CharField(max_length=255, unique=True, verbose_name="Название")
+    updated_at = models.DateTimeField(
+        auto_now=True, db_index=True, verbose_name="Дата изменения"
+    )
 
     def __str__(self):
         return self.name
@@ -90,6 +96,9 @@ class Object(models.Model):
     mark_description = models.CharField(
         max_length=255, null=True, verbose_name="Описание"
     )
+    updated_at = models.DateTimeField(
+        auto_now=True, db_index=True, verbose_name="Дата изменения"
+    )
 
     def __str__(self):
         return self.name
@@ -101,6 +110,9 @@ class Object(models.Model):
 
 class Priority(models.Model):
     name = models.CharField(max_length=255, unique=True, verbose_name="Название")
+    updated_at = models.DateTimeField(
+        auto_now=True, db_index=True, verbose_name="Дата изменения"
+    )
 
     def __str__(self):
         return self.name
@@ -112,6 +124,9 @@ class Priority(models.Model):
 
 class Status(models.Model):
     name = models.CharField(max_length=255, unique=True, verbose_name="Название")
+    updated_at = models.DateTimeField(
+        auto_now=True, db_index=True, verbose_name="Дата изменения"
+    )
 
     def __str__(self):
         return self.name
@@ -123,6 +138,9 @@ class Status(models.Model):
 
 class TypeQuality(models.Model):
     name = models.CharField(max_length=255, unique=True, verbose_name="Название")
+    updated_at = models.DateTimeField(
+        auto_now=True, db_index=True, verbose_name="Дата изменения"
+    )
 
     def __str__(self):
         return self.name
@@ -134,6 +152,9 @@ class TypeQuality(models.Model):
 
 class TypeBreaking(models.Model):
     name = models.CharField(max_length=255, unique=True, verbose_name="Название")
+    updated_at = models.DateTimeField(
+        auto_now=True, db_index=True, verbose_name="Дата изменения"
+    )
 
     def __str__(self):
         return self.name
@@ -184,14 +205,59 @@ class Task(models.Model):
     type_breaking = models.ForeignKey(
         TypeBreaking, on_delete=models.CASCADE, verbose_name="Тип поломки"
     )
+    updated_at = models.DateTimeField(
+        auto_now=True, db_index=True, verbose_name="Дата изменения"
+    )
+    report_updated_at = models.DateTimeField(
+        blank=True, null=True, db_index=True, verbose_name="Дата изменения отчета"
+    )
+
+    # Поля, из которых строится строка корпуса рекомендаций
+    REPORT_FIELDS = [
+        "object_id",
+        "description",
+        "type_breaking_id",
+        "text_report",
+        "quality_report_id",
+        "diagnostic_data",
+        "was_done",
+        "result",
+        "name_component",
+    ]
 
     def __str__(self):
         return self.name
 
+    def report_values(self):
+        # Отложенные поля не читаются из базы
+        return tuple(self.__dict__.get(name) for name in self.REPORT_FIELDS)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Исполнитель на момент загрузки: при его смене задача удаляется
+        # у прежнего исполнителя при синхронизации
+        instance._loaded_executor_id = instance.__dict__.get("executor_id")
+        # Отчет на момент загрузки: индекс рекомендаций обновляется при его смене
+        instance._loaded_report = instance.report_values()
+        return instance
+
     class Meta:
         verbose_name = "Задачи"
         verbose_name_plural = "Задачи"
-        ordering = ["status"]
+        ordering = ["status", "id"]
+        indexes = [
+            # Постраничная выдача по ключу (status, id)
+            models.Index(fields=["status", "id"], name="task_status_id_idx"),
+            # Фильтры списка задач; id в конце сохраняет порядок выдачи
+            models.Index(
+                fields=["executor", "status", "id"], name="task_executor_status_idx"
+            ),
+            models.Index(
+                fields=["object", "status", "id"], name="task_object_status_idx"
+            ),
+            models.Index(fields=["deadline"], name="task_deadline_idx"),
+        ]
 
 
 class Notification(models.Model):
@@ -204,10 +270,60 @@ class Notification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     is_read = models.BooleanField(default=False, verbose_name="Прочитано")
     is_deleted = models.BooleanField(default=False, verbose_name="Удалено")
+    updated_at = models.DateTimeField(
+        auto_now=True, db_index=True, verbose_name="Дата изменения"
+    )
 
     def __str__(self):
         return self.title
 
+    class Meta:
+        indexes = [
+            # Счетчик непрочитанных
+            models.Index(
+                fields=["user", "is_read"],
+                condition=models.Q(is_deleted=False),
+                name="notification_unread_idx",
+            ),
+            # Постраничная выдача, новые первыми
+            models.Index(
+                fields=["user", "-created_at", "-id"],
+                name="notification_user_created_idx",
+            ),
+        ]
+
+
+class NotificationOutbox(models.Model):
+    """
+    Событие для рассылки уведомлений.
+
+    Записывается в транзакции изменения задачи; получателей определяет и
+    уведомления создает команда dispatch_notifications. Обработанные события
+    отмечаются dispatched_at и удаляются политикой хранения.
+    """
+
+    event = models.CharField(max_length=64, verbose_name="Событие")
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, verbose_name="Задача")
+    title = models.CharField(max_length=65, verbose_name="Заголовок")
+    message = models.CharField(max_length=255, verbose_name="Сообщение")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    dispatched_at = models.DateTimeField(
+        blank=True, null=True, verbose_name="Дата рассылки"
+    )
+
+    class Meta:
+        verbose_name = "Очередь уведомлений"
+        verbose_name_plural = "Очередь уведомлений"
+        indexes = [
+            # Необработанные события в порядке поступления
+            models.Index(
+                fields=["id"],
+                condition=models.Q(dispatched_at__isnull=True),
+                name="outbox_pending_idx",
+            ),
+            models.Index(fields=["dispatched_at"], name="outbox_dispatched_idx"),
+        ]
+
 
 class TaskVersion(models.Model):
     version_uuid = models.UUIDField(
@@ -222,3 +338,77 @@ class TaskVersion(models.Model):
     class Meta:
         verbose_name = "Версии задачи"
         verbose_name_plural = "Версии задачи"
+        indexes = [
+            models.Index(
+                fields=["task", "updated_at"], name="taskversion_task_updated_idx"
+            ),
+        ]
+
+
+class TaskHistory(models.Model):
+    """
+    История задачи: одна строка на изменение.
+
+    changes - новые значения измененных полей. Каждая
+    TASK_HISTORY_SNAPSHOT_INTERVAL-я строка (и первая, с состоянием до
+    первого изменения) хранит в snapshot полное состояние задачи, поэтому
+    состояние на момент времени собирается из одного снимка и ограниченного
+    числа изменений.
+    """
+
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, verbose_name="Задача")
+    sequence = models.PositiveIntegerField(verbose_name="Номер изменения")
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Сотрудник",
+    )
+    changes = models.JSONField(default=dict, verbose_name="Изменения")
+    snapshot = models.JSONField(null=True, blank=True, verbose_name="Снимок")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата изменения")
+
+    class Meta:
+        verbose_name = "История задачи"
+        verbose_name_plural = "История задачи"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["task", "sequence"], name="taskhistory_task_sequence_uniq"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["task", "created_at"], name="taskhistory_task_created_idx"
+            ),
+        ]
+
+
+class DeletedRecord(models.Model):
+    """
+    Запись об удалении строки для разностной синхронизации клиентов.
+
+    Если задан user, строка перестала быть видна только этому пользователю
+    (например, задача передана другому исполнителю).
+    """
+
+    collection = models.CharField(max_length=64, verbose_name="Коллекция")
+    object_id = models.BigIntegerField(verbose_name="Идентификатор объекта")
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        verbose_name="Пользователь",
+    )
+    deleted_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата удаления")
+
+    class Meta:
+        verbose_name = "Удаленные записи"
+        verbose_name_plural = "Удаленные записи"
+        indexes = [
+            models.Index(
+                fields=["collection", "deleted_at"],
+                name="deletedrecord_coll_deleted_idx",
+            ),
+        ]
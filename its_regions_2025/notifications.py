@@ -0,0 +1,79 @@
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.utils import timezone
+
+import its_regions_2025.events as events
+import its_regions_2025.models as models
+
+TASK_CREATED = "task.created"
+
+# Получатели уведомлений по событию
+RECIPIENTS = {
+    TASK_CREATED: lambda task: [task.executor_id],
+}
+
+
+def enqueue(event, task, title, message):
+    """
+    Событие в очередь рассылки; вызывается в транзакции изменения задачи,
+    стоимость не зависит от числа получателей
+    """
+    return models.NotificationOutbox.objects.create(
+        event=event, task=task, title=title, message=message
+    )
+
+
+def check_channel_layer():
+    """
+    Рассылка идет в отдельном процессе: слой в памяти не доставит события
+    WebSocket-подключениям процессов ASGI-сервера
+    """
+    if isinstance(get_channel_layer(), InMemoryChannelLayer):
+        raise ImproperlyConfigured(
+            "Notification dispatch requires a cross-process channel layer, "
+            "set CHANNEL_REDIS_URL"
+        )
+
+
+def dispatch_batch(batch_size):
+    """
+    Рассылка до batch_size событий из очереди: уведомления создаются одним
+    bulk_create, повторные события по одной задаче для одного пользователя
+    объединяются в одно уведомление. Возвращает число обработанных событий.
+    """
+    with transaction.atomic():
+        entries = models.NotificationOutbox.objects.filter(dispatched_at__isnull=True)
+        entries = entries.select_related("task").order_by("id")
+        if connection.features.has_select_for_update_skip_locked:
+            # Несколько обработчиков разбирают очередь, не ожидая друг друга
+            entries = entries.select_for_update(skip_locked=True, of=("self",))
+        entries = list(entries[:batch_size])
+        if not entries:
+            return 0
+
+        latest = {}
+        for entry in entries:
+            for user_id in RECIPIENTS[entry.event](entry.task):
+                if user_id is not None:
+                    latest[(user_id, entry.task_id, entry.event)] = entry
+
+        notifications = models.Notification.objects.bulk_create(
+            [
+                models.Notification(
+                    user_id=user_id,
+                    task_id=task_id,
+                    title=entry.title,
+                    message=entry.message,
+                )
+                for (user_id, task_id, _), entry in latest.items()
+            ]
+        )
+        models.NotificationOutbox.objects.filter(
+            id__in=[entry.id for entry in entries]
+        ).update(dispatched_at=timezone.now())
+
+        # bulk_create не вызывает post_save, поэтому события отправляются здесь
+        for notification in notifications:
+            events.notification_created(notification)
+    return len(entries)
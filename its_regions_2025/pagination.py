@@ -0,0 +1,200 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def _encode_value(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Постраничная выдача по ключу (keyset).
+
+    Курсор хранит значения полей ordering последней строки страницы,
+    следующая страница выбирается условием "строго после курсора" по
+    индексу, без OFFSET. Поля ordering с префиксом "-" упорядочиваются по
+    убыванию; допускаются аннотации и выборки values(). Если optional,
+    выдача включается, только если в запросе передан cursor или page_size,
+    иначе список возвращается целиком.
+    """
+
+    ordering = ("id",)
+    optional = True
+    page_size = 100
+    max_page_size = 1000
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Invalid cursor"
+
+    def page_queryset(self, queryset, request):
+        """
+        Строки страницы и одна следующая, без выполнения запроса; None,
+        если выдача не постраничная
+        """
+        params = request.query_params
+        if (
+            self.optional
+            and self.cursor_query_param not in params
+            and self.page_size_query_param not in params
+        ):
+            return None
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+        return queryset[: self.get_page_size(request) + 1]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request)
+        if queryset is None:
+            return None
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        rows = list(queryset)
+        self.next_position = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self.next_position = self.get_position(queryset.model, rows[-1])
+        return rows
+
+    def get_ordering_fields(self, queryset):
+        """
+        Поля модели или аннотаций, по которым упорядочена выдача
+        """
+        fields = []
+        for name in self.ordering:
+            name = name.lstrip("-")
+            annotation = queryset.query.annotations.get(name)
+            if annotation is not None:
+                fields.append(annotation.output_field)
+            else:
+                fields.append(queryset.model._meta.get_field(name))
+        return fields
+
+    def get_position(self, model, row):
+        position = []
+        for name in self.ordering:
+            name = name.lstrip("-")
+            if isinstance(row, dict):
+                value = row[name]
+            else:
+                value = getattr(row, model._meta.get_field(name).attname)
+            position.append(value)
+        return position
+
+    def after(self, position):
+        """
+        Условие "строка после position" в лексикографическом порядке ordering
+        """
+        names = [name.lstrip("-") for name in self.ordering]
+        condition = Q()
+        for index in reversed(range(len(names))):
+            equal = dict(zip(names[:index], position[:index]))
+            lookup = "lt" if self.ordering[index].startswith("-") else "gt"
+            condition |= Q(**equal, **{f"{names[index]}__{lookup}": position[index]})
+        return condition
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        # Значения приводятся к типам полей заранее, иначе ошибка
+        # преобразования возникла бы при выполнении запроса
+        fields = self.get_ordering_fields(queryset)
+        try:
+            position = [
+                field.to_python(value) for field, value in zip(fields, position)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, position):
+        # Время с микросекундами, иначе строки с той же миллисекундой потеряются
+        position = json.dumps(position, default=_encode_value)
+        return base64.urlsafe_b64encode(position.encode("ascii")).decode("ascii")
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.next_position)
+        )
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Курсор из поля next предыдущей страницы",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Размер страницы",
+                "schema": {"type": "integer"},
+            },
+        ]
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class TaskPagination(KeysetPagination):
+    # Совпадает с Task.Meta.ordering
+    ordering = ("status", "id")
+
+
+class TaskVersionGroupPagination(KeysetPagination):
+    # Группы версий, новые первыми
+    ordering = ("-changed_at", "-version_uuid")
+    optional = False
+    page_size = 50
+
+
+class NotificationPagination(KeysetPagination):
+    # Новые уведомления первыми
+    ordering = ("-created_at", "-id")
@@ -0,0 +1,145 @@
+import asyncio
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Модуль импортируется дочерними процессами до настройки Django,
+# поэтому модели и настройки загружаются внутри функций.
+
+
+class PoolSaturated(Exception):
+    """
+    Очередь пула рекомендаций заполнена
+    """
+
+
+class PoolUnavailable(Exception):
+    """
+    Процесс пула рекомендаций завершился аварийно; пул пересоздается
+    """
+
+
+def _init_worker(settings_module):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+
+    import django
+
+    django.setup()
+
+    from its_regions_2025.recommendations import get_engine
+
+    # Процессы пула не перестраивают модель: каждый держал бы свой поток
+    # переобучения. Изменения отчетов они читают из базы при расчете
+    # рекомендаций, а новый артефакт подхватывают оттуда же.
+    get_engine(rebuild=False).preload()
+
+
+def _recommend(queries, top_n):
+    from its_regions_2025.recommendations import recommend_reports_batch
+
+    return recommend_reports_batch(queries, top_n=top_n)
+
+
+class RecommendationPool:
+    """
+    Пул процессов для расчета рекомендаций вне цикла событий.
+
+    Одновременно выполняется не больше max_workers расчетов, еще
+    max_queue ждут в очереди; остальные запросы отклоняются сразу.
+    """
+
+    def __init__(self, max_workers, max_queue):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.pending = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def create_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            # fork из многопоточного ASGI-сервера небезопасен
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(os.environ["DJANGO_SETTINGS_MODULE"],),
+        )
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = self.create_executor()
+            return self._executor
+
+    def _discard(self, executor):
+        """
+        Сброс сломанного пула; следующий запрос создаст новый
+        """
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _acquire(self):
+        with self._lock:
+            if self.pending >= self.max_workers + self.max_queue:
+                raise PoolSaturated()
+            self.pending += 1
+
+    def _release(self):
+        with self._lock:
+            self.pending -= 1
+
+    async def recommend_reports_batch(self, queries, top_n=3):
+        self._acquire()
+        try:
+            executor = self.executor
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(
+                    executor, _recommend, list(queries), top_n
+                )
+            except BrokenProcessPool:
+                # Процесс упал или не загрузил модель: без пересоздания пул
+                # отклонял бы все последующие запросы
+                self._discard(executor)
+                raise PoolUnavailable()
+        finally:
+            self._release()
+
+    async def recommend_reports(self, type_object, description, type_breaking, top_n=3):
+        results = await self.recommend_reports_batch(
+            [(type_object, description, type_breaking)], top_n=top_n
+        )
+        return results[0]
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Возвращает пул рекомендаций процесса
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                from django.conf import settings
+
+                _pool = RecommendationPool(
+                    max_workers=settings.RECOMMENDATION_POOL_WORKERS,
+                    max_queue=settings.RECOMMENDATION_POOL_QUEUE,
+                )
+                atexit.register(_pool.shutdown)
+    return _pool
@@ -0,0 +1,510 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+import pandas as pd
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+from django.utils import timezone
+
+import its_regions_2025.models as models
+from its_regions_2025.cache import LRUCache
+from model.recomendation import ReportRecommendationModel
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(type_object, description, type_breaking, top_n=3):
+    """
+    Ключ кэша рекомендаций.
+
+    TfidfVectorizer сам приводит текст к нижнему регистру и разбивает его
+    на слова, поэтому регистр и пробелы в описании на результат не влияют.
+    type_object сравнивается с корпусом точно и не нормализуется.
+    """
+    return (
+        str(type_object),
+        " ".join(str(description).lower().split()),
+        " ".join(str(type_breaking).lower().split()),
+        int(top_n),
+    )
+
+
+def active_model_path():
+    """
+    Артефакт, активированный командой build_recommendation_index, или
+    артефакт из репозитория
+    """
+    active_path = settings.RECOMMENDATION_ACTIVE_PATH
+    if os.path.exists(active_path):
+        return active_path
+    return settings.RECOMMENDATION_MODEL_PATH
+
+
+class RecommendationEngine:
+    """
+    Предзагруженная модель рекомендаций, общая для всего процесса.
+
+    Модель читается из joblib-артефакта один раз (при старте приложения или
+    при первом запросе), после чего все рекомендации считаются из памяти.
+    Результаты кэшируются в процессе и, если задан
+    RECOMMENDATION_CACHE_ALIAS, в общем кэше Django. Ключи содержат версию
+    модели, поэтому загрузка нового артефакта сбрасывает кэш.
+
+    Отчеты задач, измененные после сборки модели, читаются из базы не чаще
+    раза в RECOMMENDATION_SYNC_INTERVAL секунд и добавляются в индекс
+    обученным словарем; периодическая перестройка в фоне переобучает модель
+    на отчетах из базы и атомарно подменяет ее.
+    """
+
+    def __init__(self, model_path=None):
+        # По умолчанию путь выбирается при каждой загрузке, чтобы подхватить
+        # активированный позже артефакт
+        self._model_path = model_path
+        self.version = None
+        self.artifact_version = None
+        # Хэш истории изменений индекса после загрузки артефакта
+        self.lineage = None
+        self.cache = LRUCache(
+            maxsize=settings.RECOMMENDATION_CACHE_SIZE,
+            ttl=settings.RECOMMENDATION_CACHE_TTL,
+        )
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self.ann_recall = None
+        self._model = None
+        self._lock = threading.Lock()
+        # Отчеты задач, измененные после сборки модели, читаются из базы:
+        # так их видят все процессы, и они не теряются при перезапуске.
+        # _synced_at - момент, до которого изменения уже прочитаны.
+        self._synced_at = None
+        self._last_sync = None
+        self._sync_lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._rebuild_thread = None
+        self._stop_rebuild = threading.Event()
+
+    @property
+    def model(self):
+        model = self._model
+        if model is None:
+            with self._lock:
+                if self._model is None:
+                    self._set_model(*self._load())
+                model = self._model
+        return model
+
+    @property
+    def model_path(self):
+        return self._model_path or active_model_path()
+
+    @property
+    def shared_cache(self):
+        alias = settings.RECOMMENDATION_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    def _load(self):
+        path = str(self.model_path)
+        model = ReportRecommendationModel()
+        model.load_model(path)
+        self._prepare(model)
+        return model, self._artifact_version(path)
+
+    def _prepare(self, model):
+        """
+        Построение индекса приближенного поиска, если он включен
+        """
+        if settings.RECOMMENDATION_ANN:
+            model.build_ann(**settings.RECOMMENDATION_ANN_OPTIONS)
+            self.ann_recall = model.ann_recall()
+
+    @staticmethod
+    def _artifact_version(path):
+        # Путь может быть символьной ссылкой на каталог компактного артефакта
+        path = os.path.realpath(path)
+        if os.path.isdir(path):
+            stat = os.stat(os.path.join(path, "meta.joblib"))
+        else:
+            stat = os.stat(path)
+        raw = f"{path}:{stat.st_mtime_ns}:{stat.st_size}"
+        return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+    def _set_model(self, model, artifact_version):
+        """
+        Подмена модели; вызывается под self._lock.
+
+        Отчеты, измененные после сборки новой модели, будут прочитаны из
+        базы при ближайшей синхронизации.
+        """
+        self._model = model
+        self._synced_at = model.built_at
+        self._last_sync = None
+        if artifact_version != self.artifact_version:
+            self.artifact_version = artifact_version
+            self.lineage = None
+        self._bump_version()
+
+    def _bump_version(self, change=None):
+        """
+        Обновление версии модели и сброс кэша.
+
+        Версия зависит от артефакта и последовательности изменений индекса,
+        поэтому воркеры с разным набором добавленных отчетов не делят записи
+        общего кэша.
+        """
+        if change is not None:
+            raw = f"{self.lineage}:{change}"
+            self.lineage = hashlib.sha1(raw.encode()).hexdigest()[:12]
+        if self.lineage:
+            self.version = f"{self.artifact_version}.{self.lineage}"
+        else:
+            self.version = self.artifact_version
+        self.cache.clear()
+
+    def preload(self):
+        return self.model
+
+    def reload(self):
+        """
+        Загрузка артефакта заново с заменой текущей модели
+        """
+        model, version = self._load()
+        with self._lock:
+            self._set_model(model, version)
+        return model
+
+    def artifact_changed(self):
+        """
+        Проверка, что на диске появился новый артефакт модели
+        """
+        if self._model is None:
+            return False
+        try:
+            version = self._artifact_version(str(self.model_path))
+        except OSError:
+            return False
+        return version != self.artifact_version
+
+    def _evicted(self, model):
+        """
+        Самые старые отчеты дельты сверх RECOMMENDATION_DELTA_LIMIT.
+
+        Модель из компактного артефакта и модель движка без потока
+        перестройки (процессы пула) не перестраиваются, и без ограничения
+        дельта росла бы до загрузки нового артефакта.
+        """
+        rebuilds = model.can_rebuild and self._rebuild_thread is not None
+        if rebuilds or model.delta is None:
+            return []
+        excess = len(model.delta) - settings.RECOMMENDATION_DELTA_LIMIT
+        if excess <= 0:
+            return []
+        return list(model.delta["task_id"][:excess])
+
+    def add_reports(self, rows, removed=()):
+        """
+        Добавление или замена отчетов задач без переобучения модели.
+
+        rows - словари с полями task_id, type_object, description,
+        type_breaking, text_report, quality_report и критериями качества;
+        removed - задачи, отчеты которых удалены. Векторизуются только
+        переданные отчеты.
+        """
+        if not rows and not removed:
+            return
+        model = self.model
+        with self._lock:
+            if self._model is not model:
+                # Модель заменена: новая прочитает изменения из базы сама
+                return
+            model.update_delta(pd.DataFrame(rows) if rows else None, removed=removed)
+            evicted = self._evicted(model)
+            if evicted:
+                model.update_delta(removed=evicted)
+            self._bump_version(change=repr((rows, sorted(removed))))
+
+    def sync_due(self):
+        interval = settings.RECOMMENDATION_SYNC_INTERVAL
+        if not interval or self._model is None:
+            return False
+        return self._last_sync is None or time.monotonic() - self._last_sync >= interval
+
+    def refresh(self):
+        """
+        Подхват нового артефакта и изменений отчетов из базы.
+
+        Без потока перестройки новый артефакт загружается здесь же.
+        """
+        if self._rebuild_thread is None and self.artifact_changed():
+            self.reload()
+        else:
+            self.sync_reports()
+
+    def sync_reports(self):
+        """
+        Чтение из базы отчетов задач, измененных после предыдущей
+        синхронизации (или после сборки модели)
+        """
+        if not settings.RECOMMENDATION_SYNC_INTERVAL or self._model is None:
+            return
+        with self._sync_lock:
+            model = self._model
+            since = self._synced_at
+            # С запасом: транзакции, зафиксированные позже, но с более ранним
+            # report_updated_at, будут прочитаны при следующей синхронизации
+            synced_at = timezone.now() - timedelta(
+                seconds=settings.SYNC_CURSOR_OVERLAP_SECONDS
+            )
+            rows, removed = changed_reports(since)
+            # Повторно прочитанные без изменений отчеты не меняют индекс
+            current = model.delta_rows()
+            rows = [row for row in rows if current.get(row["task_id"]) != row]
+            removed = [
+                task_id
+                for task_id in removed
+                if task_id in current or task_id not in model.replaced_task_ids
+            ]
+            self.add_reports(rows, removed)
+            with self._lock:
+                if self._model is model:
+                    self._synced_at = max(synced_at, since) if since else synced_at
+                    self._last_sync = time.monotonic()
+
+    def rebuild(self):
+        """
+        Переобучение модели на отчетах задач из базы и атомарная замена
+        """
+        with self._rebuild_lock:
+            model = self.model
+            if not model.can_rebuild:
+                return model
+
+            # Обучение идет без блокировки: запросы обслуживает текущая модель.
+            # Изменения, сделанные во время обучения, новая модель прочитает
+            # из базы после built_at.
+            built_at = timezone.now()
+            tasks = pd.DataFrame(task_report_rows(models.Task.objects.all()))
+            new_model = model.rebuild(tasks, replace_tasks=True)
+            new_model.built_at = built_at
+            self._prepare(new_model)
+
+            with self._lock:
+                self._bump_version(change=f"rebuild:{built_at.isoformat()}")
+                self._set_model(new_model, self.artifact_version)
+            return new_model
+
+    def start_rebuild_worker(self, interval):
+        """
+        Запуск фонового потока периодической перестройки индекса.
+
+        Поток также подхватывает новый артефакт, записанный командой
+        build_recommendation_index.
+        """
+        if self._rebuild_thread is not None:
+            return
+
+        def run():
+            while not self._stop_rebuild.wait(interval):
+                try:
+                    if self.artifact_changed():
+                        self.reload()
+                        continue
+                    self.sync_reports()
+                    model = self._model
+                    if (
+                        model is not None
+                        and model.can_rebuild
+                        and model.replaced_task_ids
+                    ):
+                        self.rebuild()
+                except Exception:
+                    logger.exception("Recommendation index rebuild failed")
+
+        self._rebuild_thread = threading.Thread(
+            target=run, name="recommendation-rebuild", daemon=True
+        )
+        self._rebuild_thread.start()
+
+    def stop_rebuild_worker(self):
+        self._stop_rebuild.set()
+
+    def _current(self):
+        """
+        Модель и ее версия, прочитанные согласованно
+        """
+        self.preload()
+        with self._lock:
+            return self._model, self.version
+
+    @staticmethod
+    def _shared_key(key, version):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return f"recommendation:{version}:{digest}"
+
+    def recommend_reports(self, type_object, description, type_breaking, top_n=3):
+        return self.recommend_reports_batch(
+            [(type_object, description, type_breaking)], top_n=top_n
+        )[0]
+
+    def recommend_reports_batch(self, queries, top_n=3):
+        if self.sync_due():
+            self.refresh()
+        # Результаты сохраняются с версией модели, которой они посчитаны:
+        # если модель заменят во время расчета, они не попадут под новую версию
+        model, version = self._current()
+        keys = [normalize_query(*query, top_n=top_n) for query in queries]
+
+        results = {}
+        for key in keys:
+            value = self.cache.get((version, key))
+            if value is not None:
+                results[key] = value
+
+        missing = [key for key in dict.fromkeys(keys) if key not in results]
+
+        shared_cache = self.shared_cache
+        if missing and shared_cache is not None:
+            shared_keys = {self._shared_key(key, version): key for key in missing}
+            found = shared_cache.get_many(list(shared_keys))
+            self.shared_hits += len(found)
+            self.shared_misses += len(shared_keys) - len(found)
+            for shared_key, value in found.items():
+                key = shared_keys[shared_key]
+                results[key] = value
+                self.cache.set((version, key), value)
+            missing = [key for key in missing if key not in results]
+
+        if missing:
+            computed = model.recommend_reports_batch(
+                [key[:3] for key in missing], top_n=top_n
+            )
+            for key, value in zip(missing, computed):
+                results[key] = value
+                self.cache.set((version, key), value)
+            if shared_cache is not None:
+                shared_cache.set_many(
+                    {self._shared_key(key, version): results[key] for key in missing},
+                    timeout=settings.RECOMMENDATION_CACHE_TTL,
+                )
+
+        return [results[key] for key in keys]
+
+    def pending_reports(self):
+        model = self._model
+        if model is None or model.delta is None:
+            return 0
+        return len(model.delta)
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "pending_reports": self.pending_reports(),
+            "ann": {
+                "enabled": settings.RECOMMENDATION_ANN,
+                "recall": self.ann_recall,
+            },
+            "local": self.cache.stats(),
+            "shared": {
+                "enabled": self.shared_cache is not None,
+                "hits": self.shared_hits,
+                "misses": self.shared_misses,
+            },
+        }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine(rebuild=True):
+    """
+    Возвращает единственный экземпляр движка рекомендаций для процесса.
+
+    rebuild=False - движок без фоновой перестройки; учитывается только при
+    создании движка.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = RecommendationEngine()
+                if rebuild and settings.RECOMMENDATION_REBUILD_INTERVAL:
+                    _engine.start_rebuild_worker(
+                        settings.RECOMMENDATION_REBUILD_INTERVAL
+                    )
+    return _engine
+
+
+def recommend_reports(type_object, description, type_breaking, top_n=3):
+    return get_engine().recommend_reports(
+        type_object, description, type_breaking, top_n=top_n
+    )
+
+
+def recommend_reports_batch(queries, top_n=3):
+    return get_engine().recommend_reports_batch(queries, top_n=top_n)
+
+
+def task_report_rows(tasks):
+    """
+    Строки корпуса рекомендаций для задач tasks с текстовым отчетом
+    """
+    tasks = (
+        tasks.exclude(text_report__isnull=True)
+        .exclude(text_report="")
+        .order_by("id")
+        .values(
+            "id",
+            "object__type__name",
+            "description",
+            "type_breaking__name",
+            "text_report",
+            "quality_report__name",
+            "diagnostic_data",
+            "was_done",
+            "result",
+            "name_component",
+        )
+    )
+    return [
+        {
+            "task_id": task["id"],
+            "type_object": task["object__type__name"],
+            "description": task["description"],
+            "type_breaking": task["type_breaking__name"],
+            "text_report": task["text_report"],
+            "quality_report": task["quality_report__name"],
+            "diagnostic_data": int(task["diagnostic_data"]),
+            "was_done": int(task["was_done"]),
+            "result": int(task["result"]),
+            "name_component": int(task["name_component"]),
+        }
+        for task in tasks.iterator(chunk_size=2000)
+    ]
+
+
+def changed_reports(since):
+    """
+    Отчеты задач, измененные после since (все, если since не задан):
+    строки корпуса и задачи, отчет которых удален
+    """
+    tasks = models.Task.objects.all()
+    if since is not None:
+        tasks = tasks.filter(report_updated_at__gt=since)
+    rows = task_report_rows(tasks)
+    removed = []
+    if since is not None:
+        removed = list(
+            tasks.filter(Q(text_report__isnull=True) | Q(text_report="")).values_list(
+                "id", flat=True
+            )
+        )
+    return rows, removed
+
+
+def sync_task_reports():
+    get_engine().sync_reports()
@@ -0,0 +1,93 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.utils.encoders import JSONEncoder
+
+import its_regions_2025.models as models
+import its_regions_2025.serializers as serializers
+
+# Справочники, которые почти не меняются: имя коллекции -> (модель, сериализатор).
+# Имена совпадают с коллекциями синхронизации.
+REFERENCE_COLLECTIONS = {
+    "type_objects": (models.TypeObject, serializers.TypeObjectSerializer),
+    "priorities": (models.Priority, serializers.PrioritySerializer),
+    "statuses": (models.Status, serializers.StatusSerializer),
+    "type_breakings": (models.TypeBreaking, serializers.TypeBreakingSerializer),
+    "type_qualities": (models.TypeQuality, serializers.TypeQualitySerializer),
+}
+
+REFERENCE_MODELS = {
+    model: name for name, (model, _) in REFERENCE_COLLECTIONS.items()
+}
+
+
+class ReferenceEntry:
+    """
+    Сериализованный справочник: данные, готовый JSON и его версия
+    """
+
+    def __init__(self, data, content):
+        self.data = data
+        self.content = content
+        self.version = hashlib.sha1(content).hexdigest()[:16]
+
+    @property
+    def etag(self):
+        return f'"{self.version}"'
+
+
+def _cache():
+    return caches[settings.REFERENCE_CACHE_ALIAS]
+
+
+def _ttl(cache):
+    # Инвалидация в локальном кэше не доходит до других процессов
+    if isinstance(cache, LocMemCache):
+        return min(settings.REFERENCE_CACHE_TTL, settings.REFERENCE_CACHE_LOCAL_TTL)
+    return settings.REFERENCE_CACHE_TTL
+
+
+def _generation_key(name):
+    return f"reference:{name}:generation"
+
+
+def _generation(name):
+    return _cache().get(_generation_key(name), 0)
+
+
+def _build(name):
+    model, serializer_class = REFERENCE_COLLECTIONS[name]
+    data = serializer_class(model.objects.all(), many=True).data
+    content = json.dumps(data, cls=JSONEncoder, ensure_ascii=False).encode("utf-8")
+    return ReferenceEntry(json.loads(content), content)
+
+
+def get(name):
+    """
+    Справочник из кэша; при промахе читается из базы.
+
+    Запись хранится под ключом текущего поколения, поэтому результат
+    чтения, начатого до инвалидации, не перезапишет новые данные.
+    """
+    cache = _cache()
+    key = f"reference:{name}:{_generation(name)}"
+    entry = cache.get(key)
+    if entry is None:
+        entry = _build(name)
+        cache.set(key, entry, _ttl(cache))
+    return entry
+
+
+def invalidate(name):
+    cache = _cache()
+    key = _generation_key(name)
+    # add не перезаписывает существующий счетчик, incr атомарен в memcached/redis
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
@@ -0,0 +1,155 @@
+import gzip
+import json
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models.signals import post_delete, pre_delete
+from django.utils import timezone
+
+import its_regions_2025.models as models
+
+PURGE = "purge"
+ARCHIVE = "archive"
+
+
+class RetentionPolicy:
+    """
+    Срок хранения строк одной таблицы.
+
+    Строки старше days дней по полю date_field (и подходящие под filters)
+    удаляются (purge) или перед удалением записываются в архив (archive).
+    days = None отключает политику. Если задана collection, для удаленных
+    строк пишутся записи DeletedRecord этой коллекции синхронизации (для
+    моделей с обработчиком record_deletion их пишет он).
+    """
+
+    def __init__(
+        self,
+        name,
+        model,
+        date_field,
+        days,
+        action=PURGE,
+        filters=None,
+        collection=None,
+    ):
+        if action not in (PURGE, ARCHIVE):
+            raise ValueError(f"Unknown retention action: {action}")
+        self.name = name
+        self.model = model
+        self.date_field = date_field
+        self.days = days
+        self.action = action
+        self.filters = filters or {}
+        self.collection = collection
+
+    @property
+    def enabled(self):
+        return self.days is not None
+
+    def horizon(self, now=None):
+        return (now or timezone.now()) - timedelta(days=self.days)
+
+    def expired(self, now=None):
+        return self.model.objects.filter(
+            **{f"{self.date_field}__lt": self.horizon(now)}, **self.filters
+        )
+
+
+# Политики по умолчанию; срок и действие переопределяются в
+# settings.RETENTION_POLICIES: {"notifications": {"days": 365}, ...}
+DEFAULT_POLICIES = {
+    "notifications": dict(
+        model=models.Notification,
+        date_field="created_at",
+        days=180,
+        action=ARCHIVE,
+        collection="notifications",
+    ),
+    "deleted_notifications": dict(
+        model=models.Notification,
+        date_field="updated_at",
+        days=30,
+        filters={"is_deleted": True},
+        collection="notifications",
+    ),
+    "task_versions": dict(
+        model=models.TaskVersion, date_field="updated_at", days=365, action=ARCHIVE
+    ),
+    # Курсоры синхронизации старше этого срока не принимаются, см. sync
+    "deleted_records": dict(
+        model=models.DeletedRecord, date_field="deleted_at", days=30
+    ),
+    # Разосланные события очереди уведомлений; необработанные не удаляются
+    "notification_outbox": dict(
+        model=models.NotificationOutbox, date_field="dispatched_at", days=7
+    ),
+}
+
+
+def get_policies():
+    policies = {}
+    for name, defaults in DEFAULT_POLICIES.items():
+        options = {**defaults, **settings.RETENTION_POLICIES.get(name, {})}
+        policies[name] = RetentionPolicy(name, **options)
+    return policies
+
+
+def _has_delete_receivers(model):
+    return pre_delete.has_listeners(model) or post_delete.has_listeners(model)
+
+
+def _append_archive(path, data):
+    with open(path, "ab") as archive:
+        archive.write(data)
+        archive.flush()
+        os.fsync(archive.fileno())
+
+
+def apply_policy(policy, batch_size, archive=None, now=None):
+    """
+    Удаление устаревших строк порциями по batch_size, каждая в своей
+    транзакции, чтобы блокировки держались недолго. Для политики archive
+    строки порции дописываются в файл archive (JSONL, сжатый gzip)
+    отдельным членом gzip после фиксации транзакции: в архив не попадают
+    строки, удаление которых откатилось. Возвращает число удаленных строк.
+    """
+    # Порции выбираются по первичному ключу: старые строки в начале индекса
+    expired = policy.expired(now).order_by("pk")
+    # Без обработчиков сигналов удаления и ссылок на таблицу QuerySet.delete()
+    # удаляет порцию одним DELETE без загрузки строк, а записи об удалении
+    # пишутся одним INSERT. Если обработчики есть (например, record_deletion
+    # у уведомлений), delete() загружает строки и вызывает их, и записи об
+    # удалении пишет обработчик.
+    set_based = not _has_delete_receivers(policy.model)
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = list(expired.values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                break
+            rows = policy.model.objects.filter(pk__in=ids)
+            if archive is not None:
+                lines = "".join(
+                    json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+                    for row in rows.values()
+                )
+                data = gzip.compress(lines.encode("utf-8"))
+                transaction.on_commit(lambda data=data: _append_archive(archive, data))
+            if set_based and policy.collection is not None:
+                models.DeletedRecord.objects.bulk_create(
+                    models.DeletedRecord(collection=policy.collection, object_id=pk)
+                    for pk in ids
+                )
+            rows.delete()
+        total += len(ids)
+        if len(ids) < batch_size:
+            break
+        # Следующая порция ищется после последнего ключа, а не с начала
+        # индекса: для фильтров без индекса иначе каждая порция заново
+        # просматривала бы уже пройденные строки
+        expired = expired.filter(pk__gt=ids[-1])
+    return total
@@ -0,0 +1,7 @@
+from django.urls import path
+
+import its_regions_2025.consumers as consumers
+
+websocket_urlpatterns = [
+    path("ws/v1/updates/", consumers.UpdatesConsumer.as_asgi()),
+]
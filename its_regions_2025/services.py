@@ -0,0 +1,151 @@
+import uuid
+
+from django.conf import settings
+
+import its_regions_2025.models as models
+import its_regions_2025.serializers as serializers
+
+# Внешние ключи задачи; загружаются вместе с задачей перед изменением,
+# чтобы записать их прежние значения без отдельных запросов
+TASK_RELATED_FIELDS = [
+    "priority",
+    "status",
+    "object",
+    "executor",
+    "creator",
+    "quality_report",
+    "type_breaking",
+]
+
+VERSION_VALUE_LENGTH = models.TaskVersion._meta.get_field("value").max_length
+
+
+def task_field_values(task, names):
+    """
+    Значения полей задачи до изменения
+    """
+    return {name: getattr(task, name) for name in names}
+
+
+def _version_value(value):
+    return str(value)[:VERSION_VALUE_LENGTH]
+
+
+def record_task_versions(task, old_values, user):
+    """
+    Версии измененных полей задачи: прежние значения под одним version_uuid,
+    новые под другим. Все строки записываются одним bulk_create; поля, значение
+    которых не изменилось, не записываются.
+    """
+    changed = [
+        name for name, value in old_values.items() if getattr(task, name) != value
+    ]
+    if not changed:
+        return []
+
+    old_uuid = uuid.uuid4()
+    new_uuid = uuid.uuid4()
+    versions = [
+        models.TaskVersion(
+            version_uuid=old_uuid,
+            task=task,
+            user=user,
+            field=name,
+            value=_version_value(old_values[name]),
+        )
+        for name in changed
+    ] + [
+        models.TaskVersion(
+            version_uuid=new_uuid,
+            task=task,
+            user=user,
+            field=name,
+            value=_version_value(getattr(task, name)),
+        )
+        for name in changed
+    ]
+    return models.TaskVersion.objects.bulk_create(versions)
+
+
+def task_state(task):
+    """
+    Полное состояние задачи в представлении API
+    """
+    return dict(serializers.TaskSerializer(task).data)
+
+
+def record_task_created(task, user):
+    return models.TaskHistory.objects.create(
+        task=task, sequence=0, user=user, snapshot=task_state(task)
+    )
+
+
+def record_task_history(task, old_state, user):
+    """
+    Строка истории с новыми значениями измененных полей; вызывается в
+    транзакции изменения задачи после ее сохранения.
+    """
+    new_state = task_state(task)
+    changes = {
+        name: value
+        for name, value in new_state.items()
+        if old_state.get(name) != value
+    }
+    if not changes:
+        return None
+
+    # Строка задачи заблокирована UPDATE этой же транзакции, поэтому
+    # параллельное изменение прочитает номер уже после фиксации текущего
+    last = (
+        models.TaskHistory.objects.filter(task=task)
+        .order_by("-sequence")
+        .values_list("sequence", flat=True)
+        .first()
+    )
+    history = []
+    if last is None:
+        # Задача создана до появления истории: снимок состояния до изменения
+        history.append(models.TaskHistory(task=task, sequence=0, snapshot=old_state))
+        last = 0
+
+    sequence = last + 1
+    snapshot = None
+    if sequence % settings.TASK_HISTORY_SNAPSHOT_INTERVAL == 0:
+        snapshot = new_state
+    history.append(
+        models.TaskHistory(
+            task=task,
+            sequence=sequence,
+            user=user,
+            changes=changes,
+            snapshot=snapshot,
+        )
+    )
+    models.TaskHistory.objects.bulk_create(history)
+    return history[-1]
+
+
+def task_state_as_of(task, moment):
+    """
+    Состояние задачи на момент moment: последний снимок не позже moment и
+    изменения после него (не больше TASK_HISTORY_SNAPSHOT_INTERVAL - 1).
+    None, если история задачи начинается позже.
+    """
+    history = models.TaskHistory.objects.filter(task=task, created_at__lte=moment)
+    snapshot = (
+        history.filter(snapshot__isnull=False)
+        .order_by("-sequence")
+        .values_list("sequence", "snapshot")
+        .first()
+    )
+    if snapshot is None:
+        return None
+
+    sequence, state = snapshot
+    for changes in (
+        history.filter(sequence__gt=sequence)
+        .order_by("sequence")
+        .values_list("changes", flat=True)
+    ):
+        state.update(changes)
+    return state
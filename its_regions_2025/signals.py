@@ -0,0 +1,87 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+import its_regions_2025.events as events
+import its_regions_2025.models as models
+import its_regions_2025.reference_cache as reference_cache
+from its_regions_2025.authentication import invalidate_token
+from its_regions_2025.recommendations import sync_task_reports
+from its_regions_2025.sync import COLLECTION_NAMES
+
+
+@receiver(pre_save, sender=models.Task)
+def record_report_change(sender, instance, **kwargs):
+    # По report_updated_at воркеры читают из базы измененные отчеты
+    instance._report_changed = instance.report_values() != getattr(
+        instance, "_loaded_report", None
+    )
+    if instance._report_changed:
+        instance.report_updated_at = timezone.now()
+
+
+@receiver(post_save, sender=models.Task)
+def index_task_report(sender, instance, **kwargs):
+    if not getattr(instance, "_report_changed", False):
+        return
+    instance._report_changed = False
+    instance._loaded_report = instance.report_values()
+    # Индекс рекомендаций обновляется только после фиксации транзакции,
+    # в том числе когда отчет очищен
+    transaction.on_commit(sync_task_reports)
+
+
+def record_deletion(sender, instance, **kwargs):
+    models.DeletedRecord.objects.create(
+        collection=COLLECTION_NAMES[sender], object_id=instance.pk
+    )
+
+
+# Обработчик подключается только к моделям синхронизации: обработчик
+# post_delete без sender отключает быстрое удаление для всех моделей
+for model in COLLECTION_NAMES:
+    post_delete.connect(record_deletion, sender=model)
+
+
+@receiver(pre_save, sender=models.Task)
+def record_executor_change(sender, instance, **kwargs):
+    # Прежний исполнитель больше не видит задачу и должен удалить ее у себя
+    old_executor_id = getattr(instance, "_loaded_executor_id", None)
+    if old_executor_id is not None and old_executor_id != instance.executor_id:
+        models.DeletedRecord.objects.create(
+            collection=COLLECTION_NAMES[models.Task],
+            object_id=instance.pk,
+            user_id=old_executor_id,
+        )
+    instance._loaded_executor_id = instance.executor_id
+
+
+def invalidate_reference(sender, instance, **kwargs):
+    name = reference_cache.REFERENCE_MODELS[sender]
+    # Сброс после фиксации, иначе параллельный запрос закэширует старые данные
+    transaction.on_commit(lambda: reference_cache.invalidate(name))
+
+
+for model in reference_cache.REFERENCE_MODELS:
+    post_save.connect(invalidate_reference, sender=model)
+    post_delete.connect(invalidate_reference, sender=model)
+
+
+@receiver(post_save, sender=models.Notification)
+def push_notification(sender, instance, created, **kwargs):
+    if created:
+        events.notification_created(instance)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    # Выход пользователя удаляет токен
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=models.User)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    for key in Token.objects.filter(user_id=instance.pk).values_list("key", flat=True):
+        invalidate_token(key)
@@ -0,0 +1,202 @@
+import json
+from datetime import timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.utils.encoders import JSONEncoder
+
+import its_regions_2025.models as models
+import its_regions_2025.reference_cache as reference_cache
+import its_regions_2025.retention as retention
+import its_regions_2025.serializers as serializers
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def get_collections(user):
+    """
+    Коллекции, которые клиент получает при синхронизации:
+    имя -> (queryset, сериализатор)
+    """
+    tasks = models.Task.objects.filter(executor=user)
+
+    if user.is_superuser:
+        tasks = models.Task.objects.all()
+
+    return {
+        "users": (models.User.objects.all(), serializers.UserSerializer),
+        "type_objects": (
+            models.TypeObject.objects.all(),
+            serializers.TypeObjectSerializer,
+        ),
+        "objects": (models.Object.objects.all(), serializers.ObjectSerializer),
+        "priorities": (models.Priority.objects.all(), serializers.PrioritySerializer),
+        "statuses": (models.Status.objects.all(), serializers.StatusSerializer),
+        "tasks": (tasks, serializers.TaskSerializer),
+        "type_breakings": (
+            models.TypeBreaking.objects.all(),
+            serializers.TypeBreakingSerializer,
+        ),
+        "type_qualities": (
+            models.TypeQuality.objects.all(),
+            serializers.TypeQualitySerializer,
+        ),
+        "notifications": (
+            models.Notification.objects.filter(user=user, is_deleted=False),
+            serializers.NotificationSerializer,
+        ),
+    }
+
+
+# Модель -> имя коллекции, для записи об удалениях
+COLLECTION_NAMES = {
+    models.User: "users",
+    models.TypeObject: "type_objects",
+    models.Object: "objects",
+    models.Priority: "priorities",
+    models.Status: "statuses",
+    models.Task: "tasks",
+    models.TypeBreaking: "type_breakings",
+    models.TypeQuality: "type_qualities",
+    models.Notification: "notifications",
+}
+
+
+def parse_cursors(data, collections):
+    """
+    Курсоры клиента: имя коллекции -> момент предыдущей синхронизации
+    """
+    if data is None:
+        return {}
+    if not isinstance(data, dict):
+        raise InvalidCursor("cursors must be an object")
+
+    # Записи об удалениях старше срока хранения удалены, поэтому по более
+    # старому курсору разностная синхронизация неполна
+    policy = retention.get_policies()["deleted_records"]
+    horizon = policy.horizon() if policy.enabled else None
+
+    cursors = {}
+    for name, value in data.items():
+        if name not in collections:
+            raise InvalidCursor(f"Unknown collection: {name}")
+        if value in (None, ""):
+            continue
+        cursor = parse_datetime(str(value))
+        if cursor is None:
+            raise InvalidCursor(f"Invalid cursor for {name}: {value}")
+        if timezone.is_naive(cursor):
+            cursor = timezone.make_aware(cursor, dt_timezone.utc)
+        if horizon is not None and cursor < horizon:
+            raise InvalidCursor(f"Cursor for {name} expired, full sync required")
+        cursors[name] = cursor
+    return cursors
+
+
+def next_cursor():
+    """
+    Новый курсор с запасом: строки транзакций, зафиксированных позже начала
+    запроса, но с более ранним updated_at, придут при следующей синхронизации
+    """
+    overlap = timedelta(seconds=settings.SYNC_CURSOR_OVERLAP_SECONDS)
+    return (timezone.now() - overlap).isoformat()
+
+
+def changed_rows(queryset, cursor):
+    if cursor is None:
+        return queryset
+    return queryset.filter(updated_at__gt=cursor)
+
+
+def deleted_ids(name, user, cursor):
+    if cursor is None:
+        return []
+    ids = list(
+        models.DeletedRecord.objects.filter(
+            Q(user__isnull=True) | Q(user=user),
+            collection=name,
+            deleted_at__gt=cursor,
+        )
+        .values_list("object_id", flat=True)
+        .distinct()
+    )
+    if name == "notifications":
+        # Уведомления, помеченные удаленными после курсора
+        ids += models.Notification.objects.filter(
+            user=user, is_deleted=True, updated_at__gt=cursor
+        ).values_list("id", flat=True)
+    return ids
+
+
+def _encode(value):
+    return json.dumps(value, cls=JSONEncoder, ensure_ascii=False).encode("utf-8")
+
+
+def stream_collections(collections, cursors, user, new_cursor, chunk_size):
+    """
+    Ответ синхронизации по частям: строки читаются из базы порциями
+    chunk_size и сразу кодируются, поэтому память воркера не зависит
+    от размера коллекций
+    """
+    yield b"{"
+    for name, (queryset, serializer_class) in collections.items():
+        cursor = cursors.get(name)
+        if cursor is None and name in reference_cache.REFERENCE_COLLECTIONS:
+            yield _encode(name) + b":" + reference_cache.get(name).content + b","
+            continue
+        yield _encode(name) + b":["
+        rows = changed_rows(queryset, cursor).iterator(
+            chunk_size=chunk_size
+        )
+        first = True
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield _encode_chunk(serializer_class, chunk, first)
+                first = False
+                chunk = []
+        if chunk:
+            yield _encode_chunk(serializer_class, chunk, first)
+        yield b"],"
+
+    deleted = {
+        name: deleted_ids(name, user, cursor) for name, cursor in cursors.items()
+    }
+    yield b'"deleted":' + _encode(deleted) + b","
+    yield b'"cursors":' + _encode({name: new_cursor for name in collections})
+    yield b"}"
+
+
+async def iterate_async(parts):
+    """
+    Асинхронный итератор по частям синхронного генератора.
+
+    Под ASGI StreamingHttpResponse прочитал бы синхронный генератор целиком
+    до отправки ответа. Здесь каждая часть читается отдельно в потоке
+    синхронного кода (одном и том же, поэтому курсор базы остается
+    открытым между порциями) и сразу отдается клиенту.
+    """
+    next_part = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    try:
+        while True:
+            part = await next_part(parts, done)
+            if part is done:
+                break
+            yield part
+    finally:
+        # Клиент отключился: курсор базы закрывается сразу
+        await sync_to_async(parts.close, thread_sensitive=True)()
+
+
+def _encode_chunk(serializer_class, rows, first):
+    data = serializer_class(rows, many=True).data
+    # Элементы массива без внешних скобок, чтобы склеить порции
+    encoded = _encode(data)[1:-1]
+    return encoded if first else b"," + encoded
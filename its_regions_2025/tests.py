@@ -1,3 +1,1442 @@
-from django.test import TestCase
+import asyncio
+import base64
+import gzip
+import io
+import json
+import os
+import tempfile
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models.deletion import Collector
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+import its_regions_2025.models as models
+import its_regions_2025.sync as sync
+from its_regions_2025.filters import TaskFilterBackend
+from its_regions_2025.recommendation_pool import RecommendationPool, _init_worker
+from its_regions_2025.recommendations import RecommendationEngine
+from its_regions_2025.retention import apply_policy, get_policies
+from mysite.asgi import application
+
+from model.benchmark import (
+    generate_corpus,
+    generate_queries,
+    main as benchmark_main,
+    reference_recommend,
+    run_benchmark,
+    top_n_overlap,
+)
+from model.recomendation import ReportRecommendationModel
 
 # Create your tests here.
+
+
+class RecommendationModelTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.corpus = generate_corpus(800, seed=1)
+        cls.queries = generate_queries(cls.corpus, 40, seed=2)
+        cls.model = ReportRecommendationModel()
+        cls.model.fit(cls.corpus)
+
+    def assertSameRecommendations(self, expected, actual):
+        self.assertEqual(
+            [item["text_report"] for item in expected],
+            [item["text_report"] for item in actual],
+        )
+        for left, right in zip(expected, actual):
+            self.assertAlmostEqual(left["final_score"], right["final_score"])
+
+    def test_batch_matches_reference(self):
+        results = self.model.recommend_reports_batch(self.queries, top_n=5)
+        for query, actual in zip(self.queries, results):
+            expected = reference_recommend(self.model, *query, top_n=5)
+            self.assertSameRecommendations(expected, actual)
+
+    def test_single_query_matches_batch(self):
+        results = self.model.recommend_reports_batch(self.queries)
+        for query, expected in zip(self.queries, results):
+            self.assertEqual(self.model.recommend_reports(*query), expected)
+
+    def test_unknown_type_object(self):
+        self.assertEqual(self.model.recommend_reports("Нет такого", "текст", "Отказ"), [])
+
+    def test_compact_artifact_matches(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "compact")
+            self.model.save_compact(path)
+            compact = ReportRecommendationModel()
+            compact.load_model(path)
+            results = compact.recommend_reports_batch(self.queries, top_n=5)
+
+        expected = self.model.recommend_reports_batch(self.queries, top_n=5)
+        for left, right in zip(expected, results):
+            self.assertSameRecommendations(left, right)
+
+    def test_delta_reports_are_recommended(self):
+        model = ReportRecommendationModel()
+        model.fit(self.corpus)
+        type_object, description, type_breaking = self.queries[0]
+        model.set_delta(
+            pd.DataFrame(
+                [
+                    {
+                        "task_id": 1,
+                        "type_object": type_object,
+                        "description": description,
+                        "type_breaking": type_breaking,
+                        "text_report": "новый отчет",
+                        "quality_report": "Отлично",
+                        "diagnostic_data": 1,
+                        "was_done": 1,
+                        "result": 1,
+                        "name_component": 1,
+                    }
+                ]
+            )
+        )
+        texts = [
+            item["text_report"]
+            for item in model.recommend_reports(*self.queries[0], top_n=3)
+        ]
+        self.assertIn("новый отчет", texts)
+
+        rebuilt = model.rebuild()
+        self.assertEqual(len(rebuilt.df), len(self.corpus) + 1)
+
+    def test_delta_updates_vectorize_only_new_reports(self):
+        model = ReportRecommendationModel()
+        model.fit(self.corpus)
+        rows = self.corpus.iloc[:3].assign(task_id=[1, 2, 3])
+        model.update_delta(rows.iloc[:2])
+
+        replaced = rows.iloc[[1, 2]].assign(text_report=["замена 2", "отчет 3"])
+        transform = model.tfidf_vectorizer.transform
+        with mock.patch.object(
+            model.tfidf_vectorizer, "transform", side_effect=transform
+        ) as vectorize:
+            model.update_delta(replaced, removed=[1])
+        self.assertEqual(vectorize.call_args.args[0].shape[0], 2)
+        self.assertEqual(list(model.delta["task_id"]), [2, 3])
+
+        # Результат совпадает с полной заменой дельты
+        expected = ReportRecommendationModel()
+        expected.fit(self.corpus)
+        expected.set_delta(replaced)
+        queries = generate_queries(replaced, 10, seed=3)
+        self.assertEqual(
+            model.recommend_reports_batch(queries, top_n=5),
+            expected.recommend_reports_batch(queries, top_n=5),
+        )
+
+        model.update_delta(removed=[2, 3])
+        self.assertIsNone(model.delta)
+        self.assertEqual(model.delta_partitions, {})
+
+    def test_ann_search(self):
+        model = ReportRecommendationModel()
+        model.fit(self.corpus)
+        # Отчеты дельты просматриваются точно вместе с IVF основной партиции
+        delta = self.corpus.iloc[:20].assign(
+            task_id=range(20), text_report=[f"новый {i}" for i in range(20)]
+        )
+        model.set_delta(delta)
+        exact = model.recommend_reports_batch(self.queries, top_n=5)
+
+        model.build_ann(n_components=16, n_probe=2, rerank=10, min_partition_size=50)
+        self.assertTrue(model.ann.indexes)
+        results = model.recommend_reports_batch(self.queries, top_n=5)
+        texts = set(self.corpus["text_report"]) | set(delta["text_report"])
+        for query, recommendations in zip(self.queries, results):
+            self.assertEqual(len(recommendations), 5)
+            scores = [item["final_score"] for item in recommendations]
+            self.assertEqual(scores, sorted(scores, reverse=True))
+            for item in recommendations:
+                self.assertIn(item["text_report"], texts)
+        self.assertEqual(
+            model.recommend_reports_batch(self.queries, top_n=5, exact=True), exact
+        )
+
+        recall = model.ann_recall(sample_size=50)
+        self.assertGreaterEqual(recall, 0)
+        self.assertLessEqual(recall, 1)
+
+        # Все кластеры и все кандидаты: приближенный поиск совпадает с точным
+        model.build_ann(
+            n_components=16, n_probe=1000, rerank=1000, min_partition_size=50
+        )
+        for expected, actual in zip(
+            exact, model.recommend_reports_batch(self.queries, top_n=5)
+        ):
+            self.assertSameRecommendations(expected, actual)
+        self.assertEqual(model.ann_recall(sample_size=50), 1.0)
+
+    def test_benchmark_report(self):
+        result = run_benchmark(300, queries=20, batch_size=10, reference_queries=10)
+        for key in ("fit_s", "load_joblib_s", "load_compact_s", "single_query"):
+            self.assertIn(key, result)
+        self.assertEqual(result["overlap"]["batch"], 1.0)
+        self.assertEqual(result["overlap"]["compact"], 1.0)
+
+    def test_ann_benchmark_report(self):
+        result = run_benchmark(
+            300,
+            queries=20,
+            batch_size=10,
+            reference_queries=10,
+            ann=True,
+            ann_options={"n_components": 16, "min_partition_size": 20},
+        )
+        self.assertIn("ann_single_query", result)
+        self.assertGreaterEqual(result["ann_recall"], 0)
+        self.assertLessEqual(result["ann_recall"], 1)
+        self.assertGreaterEqual(result["overlap"]["ann"], 0)
+
+    def test_benchmark_cli_ann_options(self):
+        with mock.patch("sys.stdout", new_callable=io.StringIO):
+            report = benchmark_main(
+                [
+                    "--sizes=300",
+                    "--queries=10",
+                    "--batch-size=10",
+                    "--reference-queries=5",
+                    "--ann",
+                    "--min-partition-size=20",
+                    "--n-probe=2",
+                    "--n-components=16",
+                ]
+            )
+        result = report["results"][0]
+        self.assertEqual(result["ann_options"]["n_probe"], 2)
+        self.assertGreater(result["ann_partitions"], 0)
+
+    def test_top_n_overlap_counts_ties(self):
+        expected = [
+            {"text_report": "a", "final_score": 2.0},
+            {"text_report": "b", "final_score": 1.0},
+        ]
+        actual = [
+            {"text_report": "a", "final_score": 2.0},
+            {"text_report": "c", "final_score": 1.0},
+        ]
+        self.assertEqual(top_n_overlap(expected, actual), 1.0)
+        self.assertEqual(top_n_overlap(expected, actual[:1]), 0.5)
+
+
+@override_settings(
+    RECOMMENDATION_CACHE_ALIAS="default",
+    RECOMMENDATION_ANN=False,
+    RECOMMENDATION_SYNC_INTERVAL=0,
+)
+class RecommendationEngineTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.directory.name, "model.joblib")
+        corpus = generate_corpus(300, seed=1)
+        cls.query = generate_queries(corpus, 1, seed=2)[0]
+        model = ReportRecommendationModel()
+        model.fit(corpus)
+        model.save_model(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        caches["default"].clear()
+        self.engine = RecommendationEngine(self.path)
+
+    def report_row(self, task_id):
+        type_object, description, type_breaking = self.query
+        return {
+            "task_id": task_id,
+            "type_object": type_object,
+            "description": description,
+            "type_breaking": type_breaking,
+            "text_report": f"отчет {task_id}",
+            "quality_report": "Отлично",
+            "diagnostic_data": 1,
+            "was_done": 1,
+            "result": 1,
+            "name_component": 1,
+        }
+
+    def test_hits_and_misses(self):
+        expected = self.engine.recommend_reports(*self.query)
+        self.assertEqual(self.engine.recommend_reports(*self.query), expected)
+        stats = self.engine.stats()
+        self.assertEqual((stats["local"]["hits"], stats["local"]["misses"]), (1, 1))
+        self.assertEqual((stats["shared"]["hits"], stats["shared"]["misses"]), (0, 1))
+
+        # Другой процесс с тем же артефактом берет результат из общего кэша
+        other = RecommendationEngine(self.path)
+        self.assertEqual(other.recommend_reports(*self.query), expected)
+        self.assertEqual(other.stats()["shared"]["hits"], 1)
+
+    def test_new_reports_invalidate_results(self):
+        self.engine.recommend_reports(*self.query)
+        version = self.engine.version
+        self.engine.add_reports([self.report_row(1)])
+        self.assertNotEqual(self.engine.version, version)
+
+        result = self.engine.recommend_reports(*self.query)
+        self.assertIn("отчет 1", [item["text_report"] for item in result])
+
+    def test_result_of_replaced_model_is_not_cached(self):
+        model = self.engine.preload()
+        compute = model.recommend_reports_batch
+
+        def replace_during_compute(*args, **kwargs):
+            result = compute(*args, **kwargs)
+            self.engine.add_reports([self.report_row(1)])
+            return result
+
+        with mock.patch.object(
+            model, "recommend_reports_batch", side_effect=replace_during_compute
+        ):
+            stale = self.engine.recommend_reports(*self.query)
+
+        fresh = self.engine.recommend_reports(*self.query)
+        self.assertNotEqual(fresh, stale)
+        self.assertIn("отчет 1", [item["text_report"] for item in fresh])
+        self.assertEqual(self.engine.stats()["shared"]["hits"], 0)
+
+    @override_settings(RECOMMENDATION_DELTA_LIMIT=2)
+    def test_compact_model_delta_is_limited(self):
+        model = ReportRecommendationModel()
+        model.load_model(self.path)
+        path = os.path.join(self.directory.name, "compact")
+        model.save_compact(path)
+
+        engine = RecommendationEngine(path)
+        engine.preload()
+        engine.add_reports([self.report_row(task_id) for task_id in (1, 2, 3)])
+        self.assertEqual(engine.stats()["pending_reports"], 2)
+        self.assertEqual(list(engine.model.delta["task_id"]), [2, 3])
+
+    @override_settings(RECOMMENDATION_DELTA_LIMIT=2)
+    def test_delta_is_limited_without_rebuild_worker(self):
+        self.engine.add_reports([self.report_row(task_id) for task_id in (1, 2, 3)])
+        self.assertEqual(list(self.engine.model.delta["task_id"]), [2, 3])
+
+    @override_settings(RECOMMENDATION_SYNC_INTERVAL=30)
+    def test_artifact_reloaded_without_rebuild_worker(self):
+        path = os.path.join(self.directory.name, "reloaded.joblib")
+        model = ReportRecommendationModel()
+        model.load_model(self.path)
+        model.save_model(path)
+        engine = RecommendationEngine(path)
+        engine.preload()
+        version = engine.version
+
+        model.fit(generate_corpus(200, seed=5))
+        model.save_model(path)
+        engine.recommend_reports(*self.query)
+        self.assertNotEqual(engine.version, version)
+
+    @mock.patch("its_regions_2025.recommendations.RecommendationEngine.preload")
+    @mock.patch(
+        "its_regions_2025.recommendations.RecommendationEngine.start_rebuild_worker"
+    )
+    @mock.patch("its_regions_2025.recommendations._engine", None)
+    def test_pool_worker_does_not_rebuild(self, start_rebuild_worker, preload):
+        _init_worker(os.environ["DJANGO_SETTINGS_MODULE"])
+        preload.assert_called_once_with()
+        start_rebuild_worker.assert_not_called()
+
+    def test_rebuild_worker_waits_for_model(self):
+        with mock.patch("its_regions_2025.recommendations.logger") as logger:
+            self.engine.start_rebuild_worker(0.01)
+            time.sleep(0.1)
+            self.engine.stop_rebuild_worker()
+            self.engine._rebuild_thread.join()
+        logger.exception.assert_not_called()
+        self.assertIsNone(self.engine._model)
+
+
+class TaskDataMixin:
+    """
+    Справочники, пользователи и задачи для тестов API
+    """
+
+    def setUp(self):
+        # Справочники создаются заново в каждом тесте
+        caches[settings.REFERENCE_CACHE_ALIAS].clear()
+
+        self.user = models.User.objects.create_user(
+            "user@example.com", "user", password="password"
+        )
+        self.other = models.User.objects.create_user(
+            "other@example.com", "other", password="password"
+        )
+        self.type_object = models.TypeObject.objects.create(name="Светофор")
+        self.object = models.Object.objects.create(
+            name="Объект", type=self.type_object, longitude=0, latitude=0
+        )
+        self.priority = models.Priority.objects.create(name="Высокий")
+        self.statuses = [
+            models.Status.objects.create(name=f"Статус {index}")
+            for index in range(1, 6)
+        ]
+        for name in ["Приемлемо", "Отлично", "Не подходит по критериям", "Нет"]:
+            models.TypeQuality.objects.create(name=name)
+        self.type_breaking = models.TypeBreaking.objects.create(name="Отказ")
+
+        self.client = APIClient()
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def create_task(self, name, executor=None, **kwargs):
+        fields = {
+            "priority": self.priority,
+            "status": self.statuses[0],
+            "object": self.object,
+            "executor": executor or self.user,
+            "creator": self.user,
+            "description": "Не горит зеленый сигнал",
+            "type_breaking": self.type_breaking,
+        }
+        fields.update(kwargs)
+        return models.Task.objects.create(name=name, **fields)
+
+
+class TaskReportIndexTests(TaskDataMixin, TestCase):
+    def indexed(self, task, **fields):
+        for name, value in fields.items():
+            setattr(task, name, value)
+        with self.captureOnCommitCallbacks() as callbacks:
+            task.save()
+        return len(callbacks)
+
+    def test_reindexed_only_when_report_changes(self):
+        task = self.create_task("Задача")
+        self.assertEqual(self.indexed(task, text_report="Заменена лампа"), 1)
+        changed_at = task.report_updated_at
+        self.assertEqual(self.indexed(task, status=self.statuses[1]), 0)
+        self.assertEqual(task.report_updated_at, changed_at)
+        self.assertEqual(self.indexed(task, was_done=True), 1)
+
+        task = models.Task.objects.get(pk=task.pk)
+        self.assertEqual(self.indexed(task, deadline=timezone.now()), 0)
+        self.assertEqual(self.indexed(task, text_report="Заменен блок"), 1)
+        # Очистка отчета тоже обновляет индекс
+        self.assertEqual(self.indexed(task, text_report=""), 1)
+
+
+@override_settings(RECOMMENDATION_ANN=False, RECOMMENDATION_SYNC_INTERVAL=30)
+class RecommendationSyncTests(TaskDataMixin, TestCase):
+    query = ("Светофор", "Не горит зеленый сигнал", "Отказ")
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.task = self.create_task(
+            "Задача", text_report="Заменен блок питания", was_done=True
+        )
+        self.create_task("Другая задача", text_report="Перезагружен контроллер")
+        # Модель собрана из базы и содержит отчеты обеих задач
+        call_command(
+            "build_recommendation_index",
+            "--output-dir",
+            self.directory.name,
+            "--no-activate",
+            stdout=io.StringIO(),
+        )
+        path = next(Path(self.directory.name).glob("*.joblib"))
+        self.engine = RecommendationEngine(path)
+        self.engine.preload()
+
+    def texts(self):
+        return [
+            item["text_report"]
+            for item in self.engine.recommend_reports(*self.query, top_n=5)
+        ]
+
+    def test_changed_report_replaces_base_corpus_row(self):
+        self.engine.sync_reports()
+        self.assertEqual(self.engine.stats()["pending_reports"], 0)
+
+        self.task.text_report = "Заменена лампа"
+        self.task.save()
+        self.engine.sync_reports()
+        texts = self.texts()
+        self.assertEqual(texts.count("Заменена лампа"), 1)
+        self.assertNotIn("Заменен блок питания", texts)
+
+        # Повторное чтение того же изменения не сбрасывает кэш
+        version = self.engine.version
+        self.engine.sync_reports()
+        self.assertEqual(self.engine.version, version)
+
+    def test_cleared_report_is_removed(self):
+        self.task.text_report = "Заменена лампа"
+        self.task.save()
+        self.engine.sync_reports()
+        self.assertIn("Заменена лампа", self.texts())
+
+        self.task.text_report = ""
+        self.task.save()
+        self.engine.sync_reports()
+        self.assertEqual(self.texts(), ["Перезагружен контроллер"])
+        self.assertEqual(self.engine.stats()["pending_reports"], 0)
+
+    def test_rebuild_reads_reports_from_database(self):
+        self.task.text_report = "Заменена лампа"
+        self.task.save()
+        self.create_task("Новая задача", text_report="Заменен датчик")
+        self.engine.sync_reports()
+
+        model = self.engine.rebuild()
+        self.assertEqual(len(model.df), 3)
+        self.assertIsNone(model.delta)
+        self.assertEqual(
+            sorted(self.texts()),
+            ["Заменен датчик", "Заменена лампа", "Перезагружен контроллер"],
+        )
+
+
+class BuildRecommendationIndexTests(TaskDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for index, quality in enumerate(["Отлично", "Приемлемо", "Отлично"]):
+            self.create_task(
+                f"Задача {index}",
+                text_report=f"Заменен блок питания {index}",
+                quality_report=models.TypeQuality.objects.get(name=quality),
+                was_done=True,
+            )
+        self.create_task("Без отчета")
+
+    def build(self, *args):
+        with tempfile.TemporaryDirectory() as directory:
+            active_path = Path(directory) / "active"
+            with override_settings(RECOMMENDATION_ACTIVE_PATH=active_path):
+                call_command(
+                    "build_recommendation_index",
+                    "--output-dir",
+                    directory,
+                    *args,
+                    stdout=io.StringIO(),
+                )
+                engine = RecommendationEngine()
+                self.assertEqual(engine.model_path, active_path)
+                model = engine.preload()
+                return model, model.recommend_reports(
+                    "Светофор", "Не горит зеленый сигнал", "Отказ"
+                )
+
+    def test_build_and_activate(self):
+        tracked = os.stat(settings.RECOMMENDATION_MODEL_PATH)
+        for artifact_format in ("joblib", "compact"):
+            with self.subTest(format=artifact_format):
+                model, recommendations = self.build("--format", artifact_format)
+                self.assertEqual(model.can_rebuild, artifact_format == "joblib")
+                self.assertEqual(len(recommendations), 3)
+                self.assertTrue(
+                    recommendations[0]["text_report"].startswith("Заменен блок")
+                )
+        self.assertEqual(os.stat(settings.RECOMMENDATION_MODEL_PATH), tracked)
+
+
+class AsyncRecommendationTests(TaskDataMixin, TestCase):
+    recommendations = [[{"text_report": "Заменена лампа", "final_score": 1.0}]]
+
+    def setUp(self):
+        super().setUp()
+        self.url = f"/api/v1/async/recommendations/{self.create_task('Задача').pk}/"
+        # Потоки вместо процессов: расчет подменяется в этом же процессе
+        self.pool = RecommendationPool(max_workers=1, max_queue=0)
+        self.pool.create_executor = lambda: ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(self.pool.shutdown)
+        patcher = mock.patch("its_regions_2025.views.get_pool", return_value=self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @mock.patch("its_regions_2025.recommendations.recommend_reports_batch")
+    def test_recommendations(self, recommend):
+        recommend.return_value = self.recommendations
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), self.recommendations[0])
+        recommend.assert_called_once_with(
+            [("Светофор", "Не горит зеленый сигнал", "Отказ")], top_n=3
+        )
+        self.assertEqual(self.pool.pending, 0)
+
+    def test_saturated_pool(self):
+        self.pool.pending = self.pool.max_workers + self.pool.max_queue
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+
+    @mock.patch("its_regions_2025.recommendations.recommend_reports_batch")
+    def test_broken_pool_is_recreated(self, recommend):
+        recommend.side_effect = BrokenProcessPool()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertIsNone(self.pool._executor)
+
+        recommend.side_effect = None
+        recommend.return_value = self.recommendations
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+
+class AllDataSyncTests(TaskDataMixin, TestCase):
+    def sync(self, cursors=None):
+        data = {} if cursors is None else {"cursors": cursors}
+        response = self.client.post("/api/v1/allData/", data, format="json")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_full_sync_returns_all_collections(self):
+        self.create_task("Задача")
+        data = self.sync()
+        self.assertEqual(len(data["tasks"]), 1)
+        self.assertEqual(len(data["statuses"]), 5)
+        self.assertEqual(data["deleted"], {})
+        self.assertEqual(set(data["cursors"]), set(data) - {"deleted", "cursors"})
+
+    def test_delta_sync_returns_only_changes(self):
+        task = self.create_task("Задача")
+        gone = self.create_task("Удаленная")
+        gone_id = gone.id
+        moved = self.create_task("Переданная")
+        with self.settings(SYNC_CURSOR_OVERLAP_SECONDS=0):
+            cursors = self.sync()["cursors"]
+        time.sleep(0.01)
+
+        task.description = "Новое описание"
+        task.save()
+        gone.delete()
+        moved.executor = self.other
+        moved.save()
+
+        data = self.sync(cursors)
+        self.assertEqual([row["id"] for row in data["tasks"]], [task.id])
+        self.assertEqual(data["statuses"], [])
+        self.assertEqual(sorted(data["deleted"]["tasks"]), sorted([gone_id, moved.id]))
+
+    def test_stream_matches_regular_response(self):
+        for index in range(5):
+            self.create_task(f"Задача {index}")
+
+        with self.settings(SYNC_STREAM_CHUNK_SIZE=2):
+            response = self.client.post("/api/v1/allData/?stream=1", {}, format="json")
+            self.assertTrue(response.streaming)
+            streamed = json.loads(b"".join(response.streaming_content))
+
+        regular = self.sync()
+        streamed.pop("cursors")
+        regular.pop("cursors")
+        self.assertEqual(streamed, regular)
+
+    def test_invalid_cursor(self):
+        response = self.client.post(
+            "/api/v1/allData/", {"cursors": {"tasks": "вчера"}}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_list_body_is_full_sync(self):
+        response = self.client.post("/api/v1/allData/", [], format="json")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        data.pop("cursors")
+        full = self.sync()
+        full.pop("cursors")
+        self.assertEqual(data, full)
+
+
+class AllDataAsgiStreamTests(TaskDataMixin, TransactionTestCase):
+    # Запрос обрабатывается ASGI-приложением в отдельном потоке;
+    # Task.quality_report по умолчанию ссылается на id 4
+    reset_sequences = True
+
+    async def post(self, query_string):
+        """
+        Запрос к ASGI-приложению; для каждой части тела ответа запоминается,
+        сколько частей к моменту отправки выдал генератор синхронизации
+        """
+        requested = False
+        disconnected = asyncio.Event()
+        parts = []
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": b"{}", "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                self.assertEqual(message["status"], 200)
+            elif message.get("body"):
+                parts.append((message["body"], len(self.produced)))
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": "/api/v1/allData/",
+            "raw_path": b"/api/v1/allData/",
+            "query_string": query_string,
+            "root_path": "",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"content-type", b"application/json"),
+                (b"authorization", f"Token {self.token.key}".encode()),
+            ],
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+        await application(scope, receive, send)
+        disconnected.set()
+        return parts
+
+    async def test_stream_is_sent_while_reading(self):
+        for index in range(5):
+            await sync_to_async(self.create_task)(f"Задача {index}")
+
+        self.produced = []
+        stream_collections = sync.stream_collections
+
+        def recorded(*args, **kwargs):
+            for part in stream_collections(*args, **kwargs):
+                self.produced.append(part)
+                yield part
+
+        with mock.patch.object(sync, "stream_collections", recorded):
+            with self.settings(SYNC_STREAM_CHUNK_SIZE=2):
+                parts = await self.post(b"stream=1")
+
+        # Каждая часть отправлена до чтения следующей
+        self.assertEqual([produced for _, produced in parts][:3], [1, 2, 3])
+        self.assertEqual(len(parts), len(self.produced))
+        streamed = json.loads(b"".join(body for body, _ in parts))
+
+        regular = json.loads(b"".join(body for body, _ in await self.post(b"")))
+        streamed.pop("cursors")
+        regular.pop("cursors")
+        self.assertEqual(streamed, regular)
+
+
+class ReferenceCacheTests(TaskDataMixin, TestCase):
+    url = "/api/v1/data/statuses/"
+
+    def test_not_modified_without_reference_queries(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 5)
+        etag = response["ETag"]
+
+        # Токен в кэше, справочник тоже: база не используется
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_invalidated_on_change(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Status.objects.create(name="Статус 6")
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.json()), 6)
+        self.assertEqual(len(self.sync_statuses()), 6)
+
+    def test_process_local_cache_expires_quickly(self):
+        cache = caches[settings.REFERENCE_CACHE_ALIAS]
+        self.client.get(self.url)
+        # Изменение в другом процессе: инвалидация сюда не доходит
+        models.Status.objects.filter(name="Статус 5").update(name="Статус 6")
+
+        expired = time.time() + settings.REFERENCE_CACHE_LOCAL_TTL + 1
+        with mock.patch("time.time", return_value=expired):
+            response = self.client.get(self.url)
+        self.assertIsInstance(cache, LocMemCache)
+        self.assertIn("Статус 6", [status["name"] for status in response.json()])
+
+    def test_other_models_keep_fast_delete(self):
+        # Обработчики сигналов подключены только к своим моделям
+        collector = Collector(using="default")
+        self.assertTrue(collector.can_fast_delete(models.TaskVersion.objects.all()))
+        self.assertFalse(collector.can_fast_delete(models.Status.objects.all()))
+
+    def sync_statuses(self):
+        response = self.client.post("/api/v1/allData/", {}, format="json")
+        return response.json()["statuses"]
+
+
+class ConditionalRequestTests(TaskDataMixin, TestCase):
+    def test_list_not_modified_until_change(self):
+        task = self.create_task("Задача")
+        url = "/api/v1/data/objects/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        time.sleep(0.01)
+        self.object.name = "Новое имя"
+        self.object.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+        url = f"/api/v1/data/tasks/{task.id}/"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_etag_depends_on_user(self):
+        self.create_task("Задача")
+        url = "/api/v1/data/tasks/"
+        etag = self.client.get(url)["ETag"]
+
+        client = APIClient()
+        token = Token.objects.create(user=self.other)
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+
+class RecommendationRetrieveTests(TaskDataMixin, TestCase):
+    @mock.patch("its_regions_2025.views.get_engine")
+    @mock.patch("its_regions_2025.views.recommend_reports")
+    def test_not_modified_until_task_or_model_changes(self, recommend, get_engine):
+        recommend.return_value = [{"text_report": "Отчет", "final_score": 1.0}]
+        get_engine.return_value.version = "1"
+        task = self.create_task("Задача")
+        url = f"/api/v1/data/recommendations/{task.id}/"
+
+        response = self.client.get(url)
+        self.assertEqual(response.json(), recommend.return_value)
+        recommend.assert_called_once_with(
+            "Светофор", "Не горит зеленый сигнал", "Отказ"
+        )
+        etag = response["ETag"]
+        self.assertTrue(etag)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(recommend.call_count, 1)
+
+        get_engine.return_value.version = "2"
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        task.description = "Не горит красный сигнал"
+        task.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        missing = f"/api/v1/data/recommendations/{task.id + 1}/"
+        self.assertEqual(self.client.get(missing).status_code, 404)
+
+
+class TaskRecommendationListTests(TaskDataMixin, TestCase):
+    @mock.patch("its_regions_2025.views.recommend_reports_batch")
+    def test_recommendations_are_opt_in(self, recommend):
+        recommend.side_effect = lambda queries: [[{"query": q}] for q in queries]
+        pending = self.create_task(
+            "В работе", status=self.statuses[1], description="Мигает желтый"
+        )
+        self.create_task("Новая")
+
+        # Токен, валидатор ETag и одна выборка задач
+        with self.assertNumQueries(3):
+            tasks = self.client.get("/api/v1/data/tasks/").json()
+        self.assertTrue(all("recommendation" not in task for task in tasks))
+        recommend.assert_not_called()
+
+        # Токен уже в кэше; задачи читаются вместе со связанными объектами
+        with self.assertNumQueries(2):
+            tasks = self.client.get(
+                "/api/v1/data/tasks/?include=recommendation"
+            ).json()
+        tasks = {task["id"]: task for task in tasks}
+        self.assertEqual(len(tasks), 2)
+        self.assertEqual(
+            tasks[pending.id]["recommendation"],
+            [{"query": ["Светофор", "Мигает желтый", "Отказ"]}],
+        )
+        recommend.assert_called_once()
+
+
+class TaskPaginationTests(TaskDataMixin, TestCase):
+    def test_keyset_pages_cover_all_tasks(self):
+        for index in range(7):
+            self.create_task(f"Задача {index}", status=self.statuses[index % 3])
+        expected = list(
+            models.Task.objects.order_by("status", "id").values_list("id", flat=True)
+        )
+
+        ids = []
+        url = "/api/v1/data/tasks/?page_size=3"
+        while url:
+            page = self.client.get(url).json()
+            self.assertLessEqual(len(page["results"]), 3)
+            ids.extend(task["id"] for task in page["results"])
+            url = page["next"]
+        self.assertEqual(ids, expected)
+
+        # Без параметров пагинации список возвращается целиком
+        self.assertEqual(len(self.client.get("/api/v1/data/tasks/").json()), 7)
+
+    def test_page_etag_covers_only_page(self):
+        tasks = [self.create_task(f"Задача {index}") for index in range(5)]
+        url = "/api/v1/data/tasks/?page_size=2"
+        with CaptureQueriesContext(connection) as queries:
+            etag = self.client.get(url)["ETag"]
+        # Валидатор не агрегирует всю выборку
+        self.assertFalse(
+            any("COUNT(" in query["sql"].upper() for query in queries.captured_queries)
+        )
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Изменение за пределами страницы не меняет ее ETag
+        time.sleep(0.01)
+        tasks[4].description = "Новое описание"
+        tasks[4].save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        tasks[1].description = "Новое описание"
+        tasks[1].save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_invalid_cursor(self):
+        cursors = ["broken", ["x", "y"], [1], [None, 1], [{"id": 1}, 1]]
+        for cursor in cursors:
+            if not isinstance(cursor, str):
+                cursor = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+            with self.subTest(cursor=cursor):
+                response = self.client.get(f"/api/v1/data/tasks/?cursor={cursor}")
+                self.assertEqual(response.status_code, 404)
+
+        # Для уведомлений курсор содержит время создания
+        cursor = base64.urlsafe_b64encode(b'["yesterday", 1]').decode()
+        response = self.client.get(f"/api/v1/data/notifications/?cursor={cursor}")
+        self.assertEqual(response.status_code, 404)
+
+    def test_sparse_fields(self):
+        self.create_task("Задача")
+        with CaptureQueriesContext(connection) as queries:
+            tasks = self.client.get("/api/v1/data/tasks/?fields=id,name").json()
+        self.assertEqual(tasks, [{"id": tasks[0]["id"], "name": "Задача"}])
+        self.assertNotIn('"description"', queries[-1]["sql"])
+
+        response = self.client.get("/api/v1/data/tasks/?fields=id,secret")
+        self.assertEqual(response.status_code, 400)
+
+
+class TaskFilterTests(TaskDataMixin, TestCase):
+    url = "/api/v1/data/tasks/"
+
+    def ids(self, query):
+        response = self.client.get(f"{self.url}?{query}")
+        self.assertEqual(response.status_code, 200, response.content)
+        return sorted(task["id"] for task in response.json())
+
+    def test_filters(self):
+        first = self.create_task("Первая", deadline="2024-05-01T10:00:00Z")
+        second = self.create_task(
+            "Вторая", status=self.statuses[1], deadline="2024-05-03T10:00:00Z"
+        )
+        self.create_task("Чужая", executor=self.other, status=self.statuses[1])
+
+        status_ids = f"{self.statuses[0].id},{self.statuses[1].id}"
+        self.assertEqual(self.ids(f"status={self.statuses[1].id}"), [second.id])
+        self.assertEqual(self.ids(f"status={status_ids}"), [first.id, second.id])
+        self.assertEqual(self.ids(f"object={self.object.id}"), [first.id, second.id])
+        self.assertEqual(self.ids(f"executor={self.other.id}"), [])
+        self.assertEqual(self.ids("deadline_after=2024-05-02"), [second.id])
+        self.assertEqual(self.ids("deadline_before=2024-05-01"), [first.id])
+
+        response = self.client.get(f"{self.url}?priority=high&deadline_after=soon")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {"priority", "deadline_after"})
+
+    def test_filters_use_indexes(self):
+        backend = TaskFilterBackend()
+        queries = [
+            "status=1",
+            "priority=1",
+            "object=1",
+            "executor=1",
+            "executor=1&status=1,2",
+            "type_breaking=1",
+            "deadline_after=2024-01-01&deadline_before=2024-02-01",
+        ]
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                # На пустых таблицах планировщик предпочел бы полный просмотр
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+        for query in queries:
+            request = Request(APIRequestFactory().get(f"{self.url}?{query}"))
+            queryset = backend.filter_queryset(
+                request, models.Task.objects.order_by(), None
+            )
+            plan = queryset.explain()
+            with self.subTest(query=query):
+                self.assertIn("index", plan.lower(), plan)
+
+
+class TaskVersionRecordingTests(TaskDataMixin, TestCase):
+    def patch(self, task, data):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f"/api/v1/data/tasks/{task.id}/", data, format="json"
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(queries)
+
+    def test_only_changed_fields_are_recorded(self):
+        task = self.create_task("Задача")
+        data = {"name": "Задача", "description": "Горит красный"}
+        self.patch(task, {**data, "status": task.status_id})
+
+        versions = models.TaskVersion.objects.order_by("id")
+        self.assertEqual(
+            [(version.field, version.value) for version in versions],
+            [
+                ("description", "Не горит зеленый сигнал"),
+                ("description", "Горит красный"),
+            ],
+        )
+        self.assertNotEqual(versions[0].version_uuid, versions[1].version_uuid)
+        self.assertEqual(versions[0].user, self.user)
+
+    def test_query_count_does_not_depend_on_field_count(self):
+        task = self.create_task("Задача")
+        # Токен в кэше, чтобы сравнивать только запросы изменения
+        self.client.get("/api/v1/data/statuses/")
+        single = self.patch(task, {"name": "Одно поле"})
+        many = self.patch(
+            task,
+            {
+                "name": "Много полей",
+                "description": "Новое описание",
+                "text_report": "x" * 300,
+                "was_done": True,
+                "result": True,
+            },
+        )
+        self.assertEqual(single, many)
+        self.assertEqual(models.TaskVersion.objects.count(), 12)
+        report = models.TaskVersion.objects.filter(field="text_report").last()
+        self.assertEqual(report.value, "x" * 255)
+
+
+class TaskHistoryTests(TaskDataMixin, TestCase):
+    def test_state_as_of(self):
+        task = self.create_task("Задача")
+        url = f"/api/v1/data/tasks/{task.id}/"
+        moments = []
+        with self.settings(TASK_HISTORY_SNAPSHOT_INTERVAL=3):
+            for index in range(7):
+                self.client.patch(url, {"name": f"Имя {index}"}, format="json")
+                last = models.TaskHistory.objects.latest("sequence")
+                moments.append(last.created_at)
+            self.client.patch(url, {"was_done": True}, format="json")
+
+        history = models.TaskHistory.objects.filter(task=task)
+        self.assertEqual(history.count(), 9)
+        self.assertEqual(
+            list(
+                history.filter(snapshot__isnull=False).values_list(
+                    "sequence", flat=True
+                )
+            ),
+            [0, 3, 6],
+        )
+
+        for index, moment in enumerate(moments):
+            # Задача, снимок и изменения после него; токен в кэше
+            with self.assertNumQueries(3):
+                response = self.client.get(
+                    "/api/v1/data/tasks_versions/as_of/",
+                    {"task": task.id, "at": moment.isoformat()},
+                )
+            state = response.json()["state"]
+            self.assertEqual(state["name"], f"Имя {index}")
+            self.assertFalse(state["was_done"])
+
+    def test_as_of_errors(self):
+        task = self.create_task("Чужая", executor=self.other)
+        url = "/api/v1/data/tasks_versions/as_of/"
+        response = self.client.get(url, {"task": task.id})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(url, {"task": task.id, "at": "2024-01-01T00:00"})
+        self.assertEqual(response.status_code, 404)
+
+
+class TaskVersionsEndpointTests(TaskDataMixin, TestCase):
+    def test_versions_grouped_and_paginated(self):
+        task = self.create_task("Задача")
+        for index in range(3):
+            self.client.patch(
+                f"/api/v1/data/tasks/{task.id}/",
+                {"name": f"Имя {index}", "was_done": index % 2 == 0},
+                format="json",
+            )
+
+        groups = []
+        url = f"/api/v1/data/tasks/{task.id}/versions/?page_size=4"
+        while url:
+            # Задача, группы страницы и их строки; токен в кэше
+            with self.assertNumQueries(3):
+                page = self.client.get(url).json()
+            groups.extend(page["results"])
+            url = page["next"]
+
+        self.assertEqual(len(groups), 6)
+        self.assertEqual(len({group["version_uuid"] for group in groups}), 6)
+        names = [group["fields"][0]["value"] for group in groups]
+        # Прежние и новые значения одного изменения записаны одновременно
+        self.assertEqual(set(names[:2]), {"Имя 1", "Имя 2"})
+        self.assertEqual(set(names[-2:]), {"Задача", "Имя 0"})
+        self.assertEqual(
+            [item["field"] for item in groups[-1]["fields"]], ["name", "was_done"]
+        )
+
+    def test_versions_scoped_to_visible_tasks(self):
+        task = self.create_task("Чужая", executor=self.other)
+        models.TaskVersion.objects.create(
+            task=task, user=self.other, field="name", value="Чужая"
+        )
+        response = self.client.get(f"/api/v1/data/tasks/{task.id}/versions/")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get("/api/v1/data/tasks_versions/").json(), [])
+
+
+class UpdatesConsumerTests(TaskDataMixin, TransactionTestCase):
+    # События отправляются после фиксации транзакции, поэтому тест без
+    # обертки в транзакцию; Task.quality_report по умолчанию ссылается на id 4
+    reset_sequences = True
+
+    async def connect(self, query):
+        path = f"/ws/v1/updates/{query}"
+        communicator = WebsocketCommunicator(application, path)
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    async def test_task_diff_and_notification_are_pushed(self):
+        task = await sync_to_async(self.create_task)("Задача")
+        communicator, connected = await self.connect(f"?token={self.token.key}")
+        self.assertTrue(connected)
+
+        response = await sync_to_async(self.client.patch)(
+            f"/api/v1/data/tasks/{task.id}/", {"name": "Новое имя"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        event = await communicator.receive_json_from(timeout=5)
+        self.assertEqual(event["type"], "task.updated")
+        self.assertEqual(event["task"], task.id)
+        self.assertEqual(event["changes"], {"name": "Новое имя"})
+
+        await sync_to_async(models.Notification.objects.create)(
+            user=self.user, task=task, title="Заголовок", message="Сообщение"
+        )
+        event = await communicator.receive_json_from(timeout=5)
+        self.assertEqual(event["type"], "notification.created")
+        self.assertEqual(event["notification"]["title"], "Заголовок")
+
+        await communicator.send_json_to({"type": "ping"})
+        self.assertEqual(await communicator.receive_json_from(), {"type": "pong"})
+        await communicator.disconnect()
+
+    async def test_rejects_invalid_token(self):
+        communicator, connected = await self.connect("?token=invalid")
+        self.assertFalse(connected)
+
+
+class NotificationDispatchTests(TaskDataMixin, TestCase):
+    def create_via_api(self, name):
+        response = self.client.post(
+            "/api/v1/data/tasks/",
+            {
+                "name": name,
+                "priority": self.priority.id,
+                "status": self.statuses[0].id,
+                "object": self.object.id,
+                "executor": self.other.id,
+                "creator": self.user.id,
+                "description": "Не горит зеленый сигнал",
+                "type_breaking": self.type_breaking.id,
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()["id"]
+
+    def test_create_enqueues_and_command_dispatches(self):
+        task_id = self.create_via_api("Задача")
+        self.assertFalse(models.Notification.objects.exists())
+        self.assertEqual(models.NotificationOutbox.objects.count(), 1)
+
+        # Повторное событие по той же задаче объединяется с первым
+        models.NotificationOutbox.objects.create(
+            event="task.created", task_id=task_id, title="Новая задача", message="x"
+        )
+        second_id = self.create_via_api("Вторая")
+
+        with mock.patch(
+            "its_regions_2025.management.commands.dispatch_notifications"
+            ".check_channel_layer"
+        ):
+            call_command("dispatch_notifications", batch_size=2, stdout=io.StringIO())
+
+        notifications = models.Notification.objects.order_by("task_id")
+        self.assertEqual(
+            [(item.user_id, item.task_id) for item in notifications],
+            [(self.other.id, task_id), (self.other.id, second_id)],
+        )
+        # События остаются в очереди отмеченными до истечения срока хранения
+        pending = models.NotificationOutbox.objects.filter(dispatched_at__isnull=True)
+        self.assertFalse(pending.exists())
+
+    def test_in_memory_channel_layer_is_rejected(self):
+        with self.assertRaisesMessage(CommandError, "CHANNEL_REDIS_URL"):
+            call_command("dispatch_notifications", stdout=io.StringIO())
+
+
+class NotificationEndpointTests(TaskDataMixin, TestCase):
+    url = "/api/v1/data/notifications/"
+
+    def setUp(self):
+        super().setUp()
+        task = self.create_task("Задача")
+        self.notifications = [
+            models.Notification.objects.create(
+                user=self.user, task=task, title=f"Уведомление {index}", message=""
+            )
+            for index in range(5)
+        ]
+        self.notifications[4].is_deleted = True
+        self.notifications[4].save()
+        models.Notification.objects.create(
+            user=self.other, task=task, title="Чужое", message=""
+        )
+
+    def unread_count(self):
+        return self.client.get(f"{self.url}unread_count/").json()["unread_count"]
+
+    def test_unread_count_and_mark_read(self):
+        self.assertEqual(self.unread_count(), 4)
+
+        up_to = self.notifications[2].id
+        # Токен уже в кэше: один UPDATE
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                f"{self.url}mark_read/", {"up_to": up_to}, format="json"
+            )
+        self.assertEqual(response.json(), {"updated": 3})
+        self.assertEqual(self.unread_count(), 1)
+        self.assertEqual(
+            models.Notification.objects.filter(user=self.other, is_read=True).count(), 0
+        )
+
+        response = self.client.post(f"{self.url}mark_read/", {}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_newest_first_pages(self):
+        titles = []
+        url = f"{self.url}?page_size=2"
+        while url:
+            page = self.client.get(url).json()
+            titles.extend(item["title"] for item in page["results"])
+            url = page["next"]
+        self.assertEqual(titles, [f"Уведомление {index}" for index in range(4, -1, -1)])
+
+
+class RetentionTests(TaskDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        task = self.create_task("Задача")
+        self.notifications = [
+            models.Notification.objects.create(
+                user=self.user, task=task, title=f"Уведомление {index}", message=""
+            )
+            for index in range(5)
+        ]
+        old = timezone.now() - timedelta(days=400)
+        ids = [notification.id for notification in self.notifications[:3]]
+        models.Notification.objects.filter(id__in=ids).update(created_at=old)
+        models.Notification.objects.filter(id=self.notifications[3].id).update(
+            is_deleted=True, updated_at=old
+        )
+
+    def test_archive_and_purge_in_batches(self):
+        with tempfile.TemporaryDirectory() as directory:
+            out = io.StringIO()
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command(
+                    "apply_retention",
+                    policy=["notifications", "deleted_notifications"],
+                    batch_size=2,
+                    archive_dir=directory,
+                    stdout=out,
+                )
+            (path,) = Path(directory).glob("notifications-*.jsonl.gz")
+            with gzip.open(path, "rt", encoding="utf-8") as archive:
+                rows = [json.loads(line) for line in archive]
+
+        self.assertEqual(
+            [row["title"] for row in rows],
+            [f"Уведомление {index}" for index in range(3)],
+        )
+        self.assertEqual(
+            list(models.Notification.objects.values_list("id", flat=True)),
+            [self.notifications[4].id],
+        )
+        # Клиенты удаляют у себя уведомления, удаленные по сроку хранения
+        self.assertEqual(
+            sorted(
+                models.DeletedRecord.objects.filter(
+                    collection="notifications"
+                ).values_list("object_id", flat=True)
+            ),
+            [notification.id for notification in self.notifications[:4]],
+        )
+
+    def test_purge_queries_do_not_depend_on_rows(self):
+        models.DeletedRecord.objects.bulk_create(
+            models.DeletedRecord(collection="tasks", object_id=index)
+            for index in range(18)
+        )
+        models.DeletedRecord.objects.update(
+            deleted_at=timezone.now() - timedelta(days=400)
+        )
+
+        # У DeletedRecord нет обработчиков удаления. На порцию: точка
+        # сохранения, выбор ключей, DELETE и освобождение точки; последняя
+        # порция пуста
+        policy = get_policies()["deleted_records"]
+        with self.assertNumQueries(4 + 4 + 3):
+            self.assertEqual(apply_policy(policy, batch_size=9), 18)
+        self.assertFalse(models.DeletedRecord.objects.exists())
+
+    def test_archive_written_after_commit(self):
+        policy = get_policies()["notifications"]
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "notifications.jsonl.gz"
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.assertEqual(apply_policy(policy, 2, archive=path), 3)
+            self.assertFalse(path.exists())
+
+            # Порции записываются отдельными членами gzip
+            for callback in callbacks:
+                callback()
+            with gzip.open(path, "rt", encoding="utf-8") as archive:
+                self.assertEqual(len(archive.readlines()), 3)
+
+    def test_outbox_purges_only_dispatched_events(self):
+        task = models.Task.objects.get()
+        old = timezone.now() - timedelta(days=30)
+        pending, dispatched = [
+            models.NotificationOutbox.objects.create(
+                event="task.created", task=task, title="Новая задача", message=""
+            )
+            for _ in range(2)
+        ]
+        models.NotificationOutbox.objects.update(created_at=old)
+        models.NotificationOutbox.objects.filter(id=dispatched.id).update(
+            dispatched_at=old
+        )
+
+        policy = get_policies()["notification_outbox"]
+        self.assertEqual(apply_policy(policy, batch_size=10), 1)
+        self.assertEqual(
+            list(models.NotificationOutbox.objects.values_list("id", flat=True)),
+            [pending.id],
+        )
+
+    def test_dry_run_keeps_rows(self):
+        out = io.StringIO()
+        call_command("apply_retention", dry_run=True, stdout=out)
+        self.assertIn("notifications: 3 expired rows", out.getvalue())
+        self.assertEqual(models.Notification.objects.count(), 5)
+
+    def test_sync_skips_soft_deleted_and_rejects_expired_cursor(self):
+        data = self.client.post("/api/v1/allData/", {}, format="json").json()
+        self.assertEqual(len(data["notifications"]), 4)
+
+        cursor = (timezone.now() - timedelta(minutes=1)).isoformat()
+        self.notifications[0].is_deleted = True
+        self.notifications[0].save()
+        data = self.client.post(
+            "/api/v1/allData/", {"cursors": {"notifications": cursor}}, format="json"
+        ).json()
+        self.assertEqual(data["deleted"]["notifications"], [self.notifications[0].id])
+
+        cursor = (timezone.now() - timedelta(days=365)).isoformat()
+        response = self.client.post(
+            "/api/v1/allData/", {"cursors": {"notifications": cursor}}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class CachedTokenAuthenticationTests(TaskDataMixin, TestCase):
+    url = "/api/v1/auth/"
+
+    def test_authenticated_view_answers_from_cache(self):
+        self.assertEqual(self.client.post(self.url).status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.post(self.url)
+        self.assertEqual(response.json()["email"], self.user.email)
+        self.assertFalse(response.json()["is_admin"])
+
+    def test_logout_invalidates_token(self):
+        self.assertEqual(self.client.post(self.url).status_code, 200)
+        self.assertEqual(self.client.post("/api/v1/logout/").status_code, 200)
+        self.assertEqual(self.client.post(self.url).status_code, 401)
+
+    def test_user_change_invalidates_token(self):
+        self.assertEqual(self.client.post(self.url).status_code, 200)
+        self.user.is_superuser = True
+        self.user.save()
+        self.assertTrue(self.client.post(self.url).json()["is_admin"])
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.post(self.url).status_code, 401)
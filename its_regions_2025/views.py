@@ -1,9 +1,17 @@
 from datetime import datetime
 
-import uuid
-from django.http import HttpResponse
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Max
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views import View
 from django.contrib.auth import authenticate, login, logout
-from rest_framework import status, viewsets
+from rest_framework import exceptions, status, viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.middleware.csrf import get_token
 from rest_framework.authtoken.models import Token
@@ -14,9 +22,27 @@ from drf_spectacular.utils import extend_schema_view, extend_schema
 import its_regions_2025.serializers as serializers
 import its_regions_2025.permissions as permissions
 import its_regions_2025.models as models
+import its_regions_2025.notifications as notifications
 import its_regions_2025.docs as docs
-
-from model.recomendation import demonstrate_model
+import its_regions_2025.events as events
+import its_regions_2025.filters as filters
+import its_regions_2025.conditional as conditional
+import its_regions_2025.pagination as pagination
+import its_regions_2025.services as services
+import its_regions_2025.reference_cache as reference_cache
+import its_regions_2025.sync as sync
+
+from its_regions_2025.authentication import CachedTokenAuthentication
+from its_regions_2025.recommendation_pool import (
+    PoolSaturated,
+    PoolUnavailable,
+    get_pool,
+)
+from its_regions_2025.recommendations import (
+    get_engine,
+    recommend_reports,
+    recommend_reports_batch,
+)
 
 # Create your views here.
 
@@ -56,24 +82,13 @@ class AuthenticatedAPIView(APIView):
     serializer_class = serializers.AuthenticatedSerializer
 
     def post(self, request, *args, **kwargs) -> Response:
-        token = request.META.get("HTTP_AUTHORIZATION", "").split(" ")[1]
-
-        try:
-            token_obj = Token.objects.get(key=token)
-            user = serializers.UserSerializer(token_obj.user).data
+        # Пользователь уже загружен аутентификацией (из кэша токенов)
+        user = serializers.UserSerializer(request.user).data
 
-            user_is_admin = models.User.objects.filter(
-                email=user["email"], is_superuser=True
-            ).exists()
-
-            return Response(
-                {**user, "is_admin": user_is_admin},
-                status=status.HTTP_200_OK,
-            )
-        except (Token.DoesNotExist, IndexError) as e:
-            return Response(
-                {"error": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED
-            )
+        return Response(
+            {**user, "is_admin": request.user.is_superuser},
+            status=status.HTTP_200_OK,
+        )
 
 
 class LoginViewSet(APIView):
@@ -136,7 +151,17 @@ class LogoutViewSet(APIView):
 
 
 class AllDataViewSet(APIView):
-    """API для выхода пользователя из системы."""
+    """
+    API для синхронизации данных клиента.
+
+    Без курсоров возвращает все коллекции. Если в теле запроса передан
+    объект cursors (коллекция -> значение из предыдущего ответа), для этих
+    коллекций возвращаются только строки, измененные после курсора, и
+    идентификаторы удаленных строк в deleted. Клиент применяет удаления
+    до обновлений.
+
+    С параметром ?stream=1 ответ того же формата отдается потоком.
+    """
 
     queryset = None
     serializer_class = serializers.LogoutSerializer
@@ -171,68 +196,169 @@ class AllDataViewSet(APIView):
         #                     }
         #                 )
 
-        tasks = models.Task.objects.filter(executor=user)
+        collections = sync.get_collections(user)
 
-        if user.is_superuser:
-            tasks = models.Task.objects.all()
+        # Прежние клиенты присылают в теле список задач: это полная синхронизация
+        data = request.data if isinstance(request.data, dict) else {}
+        try:
+            cursors = sync.parse_cursors(data.get("cursors"), collections)
+        except sync.InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        new_cursor = sync.next_cursor()
+
+        if request.query_params.get("stream") in ("1", "true"):
+            parts = sync.stream_collections(
+                collections,
+                cursors,
+                user,
+                new_cursor,
+                settings.SYNC_STREAM_CHUNK_SIZE,
+            )
+            # Под ASGI синхронный итератор не отдается по частям
+            if isinstance(request._request, ASGIRequest):
+                parts = sync.iterate_async(parts)
+            return StreamingHttpResponse(parts, content_type="application/json")
+
+        data = {}
+        deleted = {}
+        for name, (queryset, serializer_class) in collections.items():
+            cursor = cursors.get(name)
+            if cursor is None and name in reference_cache.REFERENCE_COLLECTIONS:
+                data[name] = reference_cache.get(name).data
+                continue
+            data[name] = serializer_class(
+                sync.changed_rows(queryset, cursor), many=True
+            ).data
+            if cursor is not None:
+                deleted[name] = sync.deleted_ids(name, user, cursor)
 
         return Response(
             {
-                "users": serializers.UserSerializer(
-                    models.User.objects.all(), many=True
-                ).data,
-                "type_objects": serializers.TypeObjectSerializer(
-                    models.TypeObject.objects.all(), many=True
-                ).data,
-                "objects": serializers.ObjectSerializer(
-                    models.Object.objects.all(), many=True
-                ).data,
-                "priorities": serializers.PrioritySerializer(
-                    models.Priority.objects.all(), many=True
-                ).data,
-                "statuses": serializers.StatusSerializer(
-                    models.Status.objects.all(), many=True
-                ).data,
-                "tasks": serializers.TaskSerializer(tasks, many=True).data,
-                "type_breakings": serializers.TypeBreakingSerializer(
-                    models.TypeBreaking.objects.all(), many=True
-                ).data,
-                "type_qualities": serializers.TypeQualitySerializer(
-                    models.TypeQuality.objects.all(), many=True
-                ).data,
-                "notifications": serializers.NotificationSerializer(
-                    models.Notification.objects.filter(user=self.request.user),
-                    many=True,
-                ).data,
+                **data,
+                "deleted": deleted,
+                "cursors": {name: new_cursor for name in collections},
             }
         )
 
 
 @extend_schema_view(**docs.RecommendationDocumentation())
-class RecommendationViewSet(viewsets.ModelViewSet):
+class RecommendationViewSet(conditional.ConditionalMixin, viewsets.ModelViewSet):
     queryset = models.Task.objects.all()
     serializer_class = serializers.TaskSerializer
     permission_classes = [IsAuthenticated]
     http_method_names = ["get"]
 
+    def get_etag_extra(self):
+        # Рекомендации зависят от версии модели, известной после ее загрузки
+        engine = get_engine()
+        engine.preload()
+        return engine.version
+
     def list(self, request, *args, **kwargs):
         return Response([])
 
     def retrieve(self, request, *args, **kwargs):
-        task = models.Task.objects.filter(id=kwargs["pk"]).first()
-        object = task.object
-        type_object = object.type
+        updated_at = self.retrieve_validator()
+        if updated_at is None:
+            return Response(
+                {"error": "Task not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        return self.conditional_response(
+            (updated_at,), self.recommend, request, *args, **kwargs
+        )
+
+    def recommend(self, request, *args, **kwargs):
+        task = models.Task.objects.select_related("object__type", "type_breaking").get(
+            id=kwargs["pk"]
+        )
         return Response(
-            demonstrate_model(type_object.name, task.description, task.type_breaking)
+            recommend_reports(
+                task.object.type.name, task.description, task.type_breaking.name
+            )
+        )
+
+    @action(detail=False, methods=["get"])
+    def stats(self, request, *args, **kwargs):
+        if not request.user.is_superuser:
+            return Response(
+                {"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN
+            )
+        return Response(get_engine().stats(), status=status.HTTP_200_OK)
+
+
+class AsyncRecommendationView(View):
+    """Асинхронный API рекомендаций; расчет выполняется в пуле процессов."""
+
+    async def get(self, request, pk, *args, **kwargs):
+        try:
+            auth = await sync_to_async(CachedTokenAuthentication().authenticate)(
+                request
+            )
+        except exceptions.AuthenticationFailed as e:
+            return JsonResponse(
+                {"error": str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED
+            )
+        if auth is None:
+            return JsonResponse(
+                {"error": "Authentication credentials were not provided."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        task = (
+            await models.Task.objects.filter(id=pk)
+            .select_related("object__type", "type_breaking")
+            .afirst()
         )
+        if task is None:
+            return JsonResponse(
+                {"error": "Task not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        try:
+            recommendations = await get_pool().recommend_reports(
+                task.object.type.name, task.description, task.type_breaking.name
+            )
+        except PoolSaturated:
+            error = "Recommendation service is busy"
+        except PoolUnavailable:
+            error = "Recommendation service is restarting"
+        else:
+            return JsonResponse(recommendations, safe=False, status=status.HTTP_200_OK)
+
+        response = JsonResponse(
+            {"error": error}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        response["Retry-After"] = "1"
+        return response
 
 
 def index(request):
     return HttpResponse("", status=200)
 
 
+class ReferenceListMixin:
+    """
+    Список справочника из кэша reference_cache с ETag.
+
+    Если версия из If-None-Match совпадает, возвращается 304 без обращения
+    к таблице справочника.
+    """
+
+    reference_collection = None
+
+    def list(self, request, *args, **kwargs):
+        entry = reference_cache.get(self.reference_collection)
+        if conditional.etag_matches(request, entry.etag):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(entry.content, content_type="application/json")
+        response["ETag"] = entry.etag
+        return response
+
+
 @extend_schema_view(**docs.UserDocumentation())
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(conditional.ConditionalMixin, viewsets.ModelViewSet):
     queryset = models.User.objects.all()
     serializer_class = serializers.UserSerializer
     permission_classes = [IsAuthenticated]
@@ -240,15 +366,18 @@ class UserViewSet(viewsets.ModelViewSet):
 
 
 @extend_schema_view(**docs.TypeObjectDocumentation())
-class TypeObjectViewSet(viewsets.ModelViewSet):
+class TypeObjectViewSet(
+    ReferenceListMixin, conditional.ConditionalMixin, viewsets.ModelViewSet
+):
     queryset = models.TypeObject.objects.all()
     serializer_class = serializers.TypeObjectSerializer
     permission_classes = [IsAuthenticated]
     http_method_names = ["get"]
+    reference_collection = "type_objects"
 
 
 @extend_schema_view(**docs.ObjectDocumentation())
-class ObjectViewSet(viewsets.ModelViewSet):
+class ObjectViewSet(conditional.ConditionalMixin, viewsets.ModelViewSet):
     queryset = models.Object.objects.all()
     serializer_class = serializers.ObjectSerializer
     permission_classes = [IsAuthenticated]
@@ -256,152 +385,320 @@ class ObjectViewSet(viewsets.ModelViewSet):
 
 
 @extend_schema_view(**docs.PriorityDocumentation())
-class PriorityViewSet(viewsets.ModelViewSet):
+class PriorityViewSet(
+    ReferenceListMixin, conditional.ConditionalMixin, viewsets.ModelViewSet
+):
     queryset = models.Priority.objects.all()
     serializer_class = serializers.PrioritySerializer
     permission_classes = [IsAuthenticated]
     http_method_names = ["get"]
+    reference_collection = "priorities"
 
 
 @extend_schema_view(**docs.StatusDocumentation())
-class StatusViewSet(viewsets.ModelViewSet):
+class StatusViewSet(
+    ReferenceListMixin, conditional.ConditionalMixin, viewsets.ModelViewSet
+):
     queryset = models.Status.objects.all()
     serializer_class = serializers.StatusSerializer
     permission_classes = [IsAuthenticated]
     http_method_names = ["get"]
+    reference_collection = "statuses"
 
 
 @extend_schema_view(**docs.TaskDocumentation())
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(conditional.ConditionalMixin, viewsets.ModelViewSet):
     queryset = models.Task.objects.all()
     serializer_class = serializers.TaskSerializer
     permission_classes = [IsAuthenticated]
     http_method_names = ["get", "post", "patch"]
+    pagination_class = pagination.TaskPagination
+    filter_backends = [filters.TaskFilterBackend]
 
     def get_queryset(self):
         user = self.request.user
         if user.is_superuser:
-            return models.Task.objects.all()
+            queryset = models.Task.objects.all()
         else:
-            return models.Task.objects.filter(executor=user)
+            queryset = models.Task.objects.filter(executor=user)
+
+        if self.action == "partial_update":
+            queryset = queryset.select_related(*services.TASK_RELATED_FIELDS)
+        elif self.action == "versions":
+            queryset = queryset.only("id")
+
+        fields = self.requested_fields()
+        if fields is not None and not self.include_recommendation():
+            # id и status нужны для ключа постраничной выдачи
+            queryset = queryset.only("id", "status", *fields)
+        return queryset
+
+    def requested_fields(self):
+        """
+        Поля из ?fields=id,name,status для list и retrieve
+        """
+        value = self.request.query_params.get("fields")
+        if self.action not in ("list", "retrieve") or not value:
+            return None
+
+        fields = [name.strip() for name in value.split(",") if name.strip()]
+        unknown = set(fields) - set(serializers.TaskSerializer.Meta.fields)
+        if unknown:
+            raise exceptions.ValidationError(
+                {"fields": [f"Unknown fields: {', '.join(sorted(unknown))}"]}
+            )
+        return fields
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.requested_fields()
+        if fields is not None:
+            kwargs["fields"] = fields
+        return super().get_serializer(*args, **kwargs)
+
+    def include_recommendation(self):
+        include = self.request.query_params.get("include", "")
+        return "recommendation" in include.split(",")
+
+    def get_etag_extra(self):
+        # Рекомендации в списке зависят от версии модели
+        if self.action == "list" and self.include_recommendation():
+            return get_engine().version
+        return ""
 
     def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
+        if self.include_recommendation():
+            return self.conditional_response(
+                self.list_validator(),
+                self.list_with_recommendations,
+                request,
+                *args,
+                **kwargs,
+            )
+        return super().list(request, *args, **kwargs)
 
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+    def list_with_recommendations(self, request, *args, **kwargs):
+        """
+        Список задач с рекомендациями отчетов (?include=recommendation).
 
-        serializer = self.get_serializer(queryset, many=True)
+        Рекомендация считается по полям самой задачи для задач в статусе 2,
+        связанные объекты загружаются тем же запросом.
+        """
+        queryset = self.filter_queryset(self.get_queryset()).select_related(
+            "object__type", "type_breaking"
+        )
 
-        arr = []
+        page = self.paginate_queryset(queryset)
+        tasks = list(queryset) if page is None else page
+
+        pending = [task for task in tasks if task.status_id == 2]
+        recommendations = {}
+        if pending:
+            queries = [
+                (task.object.type.name, task.description, task.type_breaking.name)
+                for task in pending
+            ]
+            recommendations = dict(
+                zip(
+                    [task.pk for task in pending],
+                    recommend_reports_batch(queries),
+                )
+            )
 
-        for task in serializer.data:
-            if task["status"] == 2:
-                task_inner = models.Task.objects.filter(status=5).first()
-                object = task_inner.object
-                type_object = object.type
-                task = {
-                    **task,
-                    "recommendation": demonstrate_model(
-                        type_object.name,
-                        task_inner.description,
-                        task_inner.type_breaking,
-                    ),
-                }
-                arr.append(task)
-            else:
-                arr.append(task)
+        arr = []
+        serializer = self.get_serializer(tasks, many=True)
+        for task, data in zip(tasks, serializer.data):
+            if task.pk in recommendations:
+                data = {**data, "recommendation": recommendations[task.pk]}
+            arr.append(data)
 
+        if page is not None:
+            return self.get_paginated_response(arr)
         return Response(arr, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=["get"])
+    def versions(self, request, *args, **kwargs):
+        """
+        История версий задачи, сгруппированная по version_uuid, новые первыми.
+        Постранично по курсору: группы одной страницы и их строки читаются
+        двумя запросами по индексу (task, updated_at).
+        """
+        task = self.get_object()
+        versions = models.TaskVersion.objects.filter(task=task)
+
+        paginator = pagination.TaskVersionGroupPagination()
+        groups = paginator.paginate_queryset(
+            versions.values("version_uuid").annotate(changed_at=Max("updated_at")),
+            request,
+            view=self,
+        )
+
+        rows = {group["version_uuid"]: [] for group in groups}
+        users = {}
+        for version in versions.filter(version_uuid__in=list(rows)).order_by("id"):
+            rows[version.version_uuid].append(
+                {"id": version.id, "field": version.field, "value": version.value}
+            )
+            users[version.version_uuid] = version.user_id
+
+        return paginator.get_paginated_response(
+            [
+                {
+                    "version_uuid": group["version_uuid"],
+                    "updated_at": group["changed_at"],
+                    "user": users[group["version_uuid"]],
+                    "fields": rows[group["version_uuid"]],
+                }
+                for group in groups
+            ]
+        )
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
+        with transaction.atomic():
+            self.perform_create(serializer)
+            history = services.record_task_created(serializer.instance, request.user)
+            events.task_created(serializer.instance, history.snapshot)
+            notifications.enqueue(
+                notifications.TASK_CREATED,
+                serializer.instance,
+                title="Новая задача",
+                message="Пользователь создал новую задачу",
+            )
         headers = self.get_success_headers(serializer.data)
 
-        models.Notification.objects.create(
-            user=serializer.data.get("executor"),
-            task=serializer.data.get("id"),
-            title="Новая задача",
-            message="Пользователь создал новую задачу",
-        )
-
         return Response(
             serializer.data, status=status.HTTP_201_CREATED, headers=headers
         )
 
     def partial_update(self, request, *args, **kwargs):
-        kwargs["partial"] = True
         instance = self.get_object()
-        old_values = {
-            field.name: getattr(instance, field.name) for field in instance._meta.fields
-        }
-        updated_task = self.update(request, *args, **kwargs)
-        updated_instance = self.get_object()
-
-        new_values = {
-            field.name: getattr(updated_instance, field.name)
-            for field in updated_instance._meta.fields
-        }
-
-        print(old_values)
-
-        old_uuid = str(uuid.uuid4())
-        for key in request.data:
-            models.TaskVersion.objects.create(
-                version_uuid=old_uuid,
-                task=updated_instance,
-                user=updated_instance.executor,
-                field=key,
-                value=old_values[key],
-            )
+        serializer = self.get_serializer(instance, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
 
-        new_uuid = str(uuid.uuid4())
-        for key in request.data:
-            models.TaskVersion.objects.create(
-                version_uuid=new_uuid,
-                task=updated_instance,
-                user=updated_instance.executor,
-                field=key,
-                value=new_values[key],
+        with transaction.atomic():
+            old_values = services.task_field_values(
+                instance, serializer.validated_data
+            )
+            old_state = services.task_state(instance)
+            old_executor_id = instance.executor_id
+            self.perform_update(serializer)
+            services.record_task_versions(
+                instance, old_values, user=instance.executor
             )
+            history = services.record_task_history(
+                instance, old_state, user=request.user
+            )
+            if history is not None:
+                events.task_updated(instance, history.changes, old_executor_id)
 
-        return updated_task
+        return Response(serializer.data)
 
 
-@extend_schema_view(**docs.TaskDocumentation())
-class TaskVersionViewSet(viewsets.ModelViewSet):
+@extend_schema_view(**docs.TaskVersionDocumentation())
+class TaskVersionViewSet(conditional.ConditionalMixin, viewsets.ModelViewSet):
     queryset = models.TaskVersion.objects.all()
     serializer_class = serializers.TaskVersionSerializer
     permission_classes = [IsAuthenticated]
     http_method_names = ["get"]
 
+    def get_queryset(self):
+        # Только версии задач, видимых пользователю
+        user = self.request.user
+        if user.is_superuser:
+            return models.TaskVersion.objects.all()
+        return models.TaskVersion.objects.filter(task__executor=user)
+
+    @action(detail=False, methods=["get"])
+    def as_of(self, request, *args, **kwargs):
+        """Состояние задачи на момент времени по истории изменений."""
+        try:
+            task_id = int(request.query_params["task"])
+            moment = parse_datetime(request.query_params["at"])
+        except (KeyError, ValueError):
+            moment = None
+        if moment is None:
+            return Response(
+                {"error": "Parameters task (id) and at (ISO 8601) are required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+
+        tasks = models.Task.objects.all()
+        if not request.user.is_superuser:
+            tasks = tasks.filter(executor=request.user)
+        task = tasks.filter(id=task_id).only("id").first()
+        if task is None:
+            return Response(
+                {"error": "Task not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        state = services.task_state_as_of(task, moment)
+        if state is None:
+            return Response(
+                {"error": "No history for this moment"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response(
+            {"task": task.id, "as_of": moment, "state": state},
+            status=status.HTTP_200_OK,
+        )
+
 
 @extend_schema_view(**docs.TypeBreakingDocumentation())
-class TypeBreakingViewSet(viewsets.ModelViewSet):
+class TypeBreakingViewSet(
+    ReferenceListMixin, conditional.ConditionalMixin, viewsets.ModelViewSet
+):
     queryset = models.TypeBreaking.objects.all()
     serializer_class = serializers.TypeBreakingSerializer
     permission_classes = [IsAuthenticated]
     http_method_names = ["get"]
+    reference_collection = "type_breakings"
 
 
 @extend_schema_view(**docs.TypeQualityDocumentation())
-class TypeQualityViewSet(viewsets.ModelViewSet):
+class TypeQualityViewSet(
+    ReferenceListMixin, conditional.ConditionalMixin, viewsets.ModelViewSet
+):
     queryset = models.TypeQuality.objects.all()
     serializer_class = serializers.TypeQualitySerializer
     permission_classes = [IsAuthenticated]
     http_method_names = ["get"]
+    reference_collection = "type_qualities"
 
 
 @extend_schema_view(**docs.NotificationDocumentation())
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(conditional.ConditionalMixin, viewsets.ModelViewSet):
     queryset = models.Notification.objects.all()
     serializer_class = serializers.NotificationSerializer
     permission_classes = [IsAuthenticated, permissions.IsOwner]
     http_method_names = ["get", "post"]
+    pagination_class = pagination.NotificationPagination
 
     def get_queryset(self):
         return models.Notification.objects.filter(user=self.request.user)
+
+    @action(detail=False, methods=["get"])
+    def unread_count(self, request, *args, **kwargs):
+        count = models.Notification.objects.filter(
+            user=request.user, is_read=False, is_deleted=False
+        ).count()
+        return Response({"unread_count": count}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["post"])
+    def mark_read(self, request, *args, **kwargs):
+        """Отметить прочитанными все уведомления пользователя с id <= up_to."""
+        try:
+            up_to = int(request.data["up_to"])
+        except (KeyError, TypeError, ValueError):
+            return Response(
+                {"error": "up_to (notification id) is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # update не обновляет auto_now, а по updated_at работает синхронизация
+        updated = models.Notification.objects.filter(
+            user=request.user, id__lte=up_to, is_read=False
+        ).update(is_read=True, updated_at=timezone.now())
+        return Response({"updated": updated}, status=status.HTTP_200_OK)
@@ -0,0 +1,135 @@
+import numpy as np
+from scipy import sparse
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize
+
+
+def _spherical_kmeans(embeddings, n_lists, iterations, rng):
+    """
+    k-means по косинусной мере на нормированных векторах
+    """
+    centroids = embeddings[rng.choice(len(embeddings), n_lists, replace=False)]
+    for _ in range(iterations):
+        assignment = np.argmax(embeddings @ centroids.T, axis=1)
+        for index in range(n_lists):
+            members = embeddings[assignment == index]
+            if len(members):
+                centroids[index] = members.sum(axis=0)
+        centroids = normalize(centroids)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Инвертированный индекс (IVF) по плотным векторам одной партиции.
+
+    Векторы партиции разбиваются на n_lists кластеров. Запрос просматривает
+    только n_probe ближайших кластеров, отбирает rerank кандидатов по
+    приближенной оценке и пересчитывает для них точное косинусное сходство
+    по TF-IDF.
+    """
+
+    def __init__(self, embeddings, n_lists, n_probe, rerank, seed=0, train_size=20000):
+        rng = np.random.default_rng(seed)
+        self.embeddings = embeddings.astype(np.float32)
+        self.n_probe = min(n_probe, n_lists)
+        self.rerank = rerank
+
+        train = self.embeddings
+        if len(train) > train_size:
+            train = train[rng.choice(len(train), train_size, replace=False)]
+        self.centroids = _spherical_kmeans(train.copy(), n_lists, 10, rng)
+
+        # Распределение всех векторов по кластерам порциями
+        assignment = np.concatenate(
+            [
+                np.argmax(chunk @ self.centroids.T, axis=1)
+                for chunk in np.array_split(
+                    self.embeddings, max(1, len(self.embeddings) // 50000)
+                )
+            ]
+        )
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(n_lists + 1))
+        self.lists = [order[bounds[i] : bounds[i + 1]] for i in range(n_lists)]
+
+    def search(self, query_embedding, query_vector, partition, top_n):
+        """
+        Кандидаты партиции для одного запроса: позиции и точные итоговые оценки
+        """
+        centroid_scores = self.centroids @ query_embedding
+        probe = np.argpartition(-centroid_scores, self.n_probe - 1)[: self.n_probe]
+        candidates = np.concatenate([self.lists[index] for index in probe])
+        if not len(candidates):
+            return candidates, np.zeros(0)
+
+        approx_scores = (
+            self.embeddings[candidates] @ query_embedding * 0.6
+            + partition.quality_scores[candidates] * 0.4
+        )
+        shortlist_size = max(self.rerank, top_n)
+        if len(candidates) > shortlist_size:
+            best = np.argpartition(-approx_scores, shortlist_size - 1)[:shortlist_size]
+            candidates = candidates[best]
+        # Порядок строк партиции сохраняет порядок при равных оценках
+        candidates = np.sort(candidates)
+
+        similarities = (partition.matrix[candidates] @ query_vector.T).toarray().ravel()
+        final_scores = similarities * 0.6 + partition.quality_scores[candidates] * 0.4
+        return candidates, final_scores
+
+
+class ANNIndex:
+    """
+    Приближенный поиск ближайших отчетов.
+
+    TF-IDF векторы проецируются усеченным SVD в плотное пространство
+    фиксированной размерности, для каждой крупной партиции строится IVFIndex.
+    Партиции меньше min_partition_size просматриваются точно.
+    """
+
+    def __init__(
+        self,
+        partitions,
+        n_components=128,
+        n_probe=64,
+        rerank=1000,
+        min_partition_size=20000,
+        seed=0,
+        train_size=50000,
+    ):
+        rng = np.random.default_rng(seed)
+        self.indexes = {}
+        self.svd = None
+        large = {
+            type_object: partition
+            for type_object, partition in partitions.items()
+            if len(partition) >= min_partition_size
+        }
+        if not large:
+            return
+
+        matrices = [partition.matrix for partition in partitions.values()]
+        stacked = sparse.vstack(matrices).tocsr()
+        if stacked.shape[0] > train_size:
+            stacked = stacked[rng.choice(stacked.shape[0], train_size, replace=False)]
+
+        n_components = max(1, min(n_components, stacked.shape[1] - 1, stacked.shape[0] - 1))
+        self.svd = TruncatedSVD(n_components=n_components, random_state=seed)
+        self.svd.fit(stacked)
+
+        for type_object, partition in large.items():
+            embeddings = self.embed(partition.matrix)
+            self.indexes[type_object] = IVFIndex(
+                embeddings,
+                n_lists=max(1, int(np.sqrt(len(partition)))),
+                n_probe=n_probe,
+                rerank=rerank,
+                seed=seed,
+            )
+
+    def embed(self, matrix):
+        return normalize(self.svd.transform(matrix)).astype(np.float32)
+
+    def get(self, type_object):
+        return self.indexes.get(type_object)
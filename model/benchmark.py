@@ -0,0 +1,317 @@
+"""
+Бенчмарк модели рекомендаций на синтетических корпусах.
+
+Запуск из корня проекта:
+
+    python -m model.benchmark --sizes 1000 10000 100000 --output bench.json
+
+Для каждого размера корпуса измеряются время обучения и загрузки
+артефактов, задержка одиночного запроса, пропускная способность пакетного
+режима, занимаемая память и совпадение top-n с исходной реализацией
+на pandas.
+
+С флагом --ann замеряется и приближенный поиск. IVF строится только для
+партиций (type_object) не меньше --min-partition-size строк, а в корпусе
+семь типов объектов, поэтому при значении по умолчанию 20000 режим
+включается с размера около 140000:
+
+    python -m model.benchmark --sizes 200000 --ann --n-probe 64 --rerank 1000
+
+На синтетическом корпусе в 200000 строк (случайный текст без кластеров,
+худший случай для IVF) одиночный запрос без ANN занимает около 13-15 мс
+(p50); recall@3 и p50 приближенного поиска:
+
+    n_probe  rerank  recall  p50
+          8      50    0.23  5.6 мс
+         32     500    0.52  7.3 мс
+         64    1000    0.75  7.9 мс
+         96    1000    0.85 10.3 мс
+
+Recall ограничивает n_probe, а не rerank. По умолчанию выбраны
+n_probe=64 и rerank=1000; на реальных отчетах, которые лучше
+кластеризуются, recall выше. Измеренный recall отдается в
+/recommendations/stats/.
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics.pairwise import cosine_similarity
+
+from model.recomendation import UNSUITABLE_QUALITY, ReportRecommendationModel
+
+TYPE_OBJECTS = ["Метео", "Видео", "ПУИД", "АОС", "Светофор", "T.7", "ТПИ/ЗПИ"]
+TYPE_BREAKINGS = ["Отказ", "Выход из строя ЗУ", "Аварийное отключение питания"]
+QUALITY_REPORTS = ["Приемлемо", "Отлично", UNSUITABLE_QUALITY]
+
+
+def generate_corpus(size, seed=0, vocabulary_size=5000):
+    """
+    Синтетический корпус отчетов с распределением полей как в parsed_dataset
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"слово{index}" for index in range(vocabulary_size)])
+    # Частоты слов по закону Ципфа, как в естественном тексте
+    weights = 1.0 / np.arange(1, vocabulary_size + 1)
+    weights /= weights.sum()
+
+    def texts(length):
+        words = rng.choice(vocabulary, size=(size, length), p=weights)
+        return [" ".join(row) for row in words]
+
+    return pd.DataFrame(
+        {
+            "id": np.arange(size),
+            "type_object": rng.choice(TYPE_OBJECTS, size),
+            "description": texts(8),
+            "type_breaking": rng.choice(TYPE_BREAKINGS, size),
+            "text_report": texts(12),
+            "quality_report": rng.choice(QUALITY_REPORTS, size, p=[0.8, 0.07, 0.13]),
+            "diagnostic_data": rng.integers(0, 2, size),
+            "was_done": rng.integers(0, 2, size),
+            "result": rng.integers(0, 2, size),
+            "name_component": rng.integers(0, 2, size),
+        }
+    )
+
+
+def generate_queries(df, count, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = df.iloc[rng.choice(len(df), count)]
+    return list(zip(rows["type_object"], rows["description"], rows["type_breaking"]))
+
+
+def reference_recommend(model, type_object, description, type_breaking, top_n=3):
+    """
+    Исходная реализация recommend_reports на pandas для сравнения результатов
+    """
+    df = model.df
+    input_vector = model.tfidf_vectorizer.transform(
+        [f"{type_object} {description} {type_breaking}"]
+    )
+    similarities = cosine_similarity(input_vector, model.tfidf_matrix)[0]
+
+    filtered_df = df[
+        (df["type_object"] == type_object)
+        & (df["quality_report"] != UNSUITABLE_QUALITY)
+    ].copy()
+    filtered_df["similarity"] = similarities[filtered_df.index]
+    filtered_df["final_score"] = (
+        filtered_df["similarity"] * 0.6 + filtered_df["quality_score"] * 0.4
+    )
+    recommendations = filtered_df.nlargest(top_n, "final_score")
+    return recommendations[["text_report", "final_score"]].to_dict("records")
+
+
+def top_n_overlap(expected, actual):
+    """
+    Доля отчетов эталона, попавших в результат.
+
+    Отчет с оценкой, равной последней оценке эталона, тоже считается
+    совпадением: при равенстве порядок строк может отличаться.
+    """
+    if not expected:
+        return 1.0 if not actual else 0.0
+
+    texts = [item["text_report"] for item in expected]
+    boundary = expected[-1]["final_score"]
+    matched = 0
+    for item in actual:
+        if item["text_report"] in texts:
+            texts.remove(item["text_report"])
+            matched += 1
+        elif abs(item["final_score"] - boundary) <= 1e-9:
+            matched += 1
+    return min(matched, len(expected)) / len(expected)
+
+
+def _timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _percentiles(samples):
+    samples = np.asarray(samples) * 1000
+    return {
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "p99_ms": float(np.percentile(samples, 99)),
+    }
+
+
+def run_benchmark(
+    size,
+    queries=200,
+    batch_size=100,
+    reference_queries=50,
+    top_n=3,
+    seed=0,
+    ann=False,
+    ann_options=None,
+):
+    """
+    Замеры для одного размера корпуса
+
+    ann_options - параметры ANNIndex для режима ANN
+    """
+    df = generate_corpus(size, seed=seed)
+    query_list = generate_queries(df, queries, seed=seed + 1)
+
+    tracemalloc.start()
+    model = ReportRecommendationModel()
+    _, fit_time = _timed(model.fit, df)
+    _, fit_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "size": size,
+        "fit_s": fit_time,
+        "fit_peak_mb": fit_peak / 2**20,
+        "index_mb": sum(
+            (partition.matrix.data.nbytes + partition.matrix.indices.nbytes)
+            for partition in model.partitions.values()
+        )
+        / 2**20,
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        joblib_path = os.path.join(directory, "model.joblib")
+        compact_path = os.path.join(directory, "compact")
+        model.save_model(joblib_path)
+        model.save_compact(compact_path)
+
+        loaded = ReportRecommendationModel()
+        _, result["load_joblib_s"] = _timed(loaded.load_model, joblib_path)
+        compact = ReportRecommendationModel()
+        _, result["load_compact_s"] = _timed(compact.load_model, compact_path)
+        compact_results = compact.recommend_reports_batch(query_list, top_n=top_n)
+
+    latencies = []
+    for query in query_list:
+        _, elapsed = _timed(model.recommend_reports, *query, top_n=top_n)
+        latencies.append(elapsed)
+    result["single_query"] = _percentiles(latencies)
+
+    batches = [
+        query_list[start : start + batch_size]
+        for start in range(0, len(query_list), batch_size)
+    ]
+    batch_results = []
+    start = time.perf_counter()
+    for batch in batches:
+        batch_results.extend(model.recommend_reports_batch(batch, top_n=top_n))
+    elapsed = time.perf_counter() - start
+    result["batch_queries_per_s"] = len(query_list) / elapsed if elapsed else None
+
+    reference = []
+    reference_latencies = []
+    for query in query_list[:reference_queries]:
+        recommendations, elapsed = _timed(
+            reference_recommend, model, *query, top_n=top_n
+        )
+        reference.append(recommendations)
+        reference_latencies.append(elapsed)
+    result["reference_single_query"] = _percentiles(reference_latencies)
+    result["overlap"] = {
+        "batch": float(
+            np.mean([top_n_overlap(e, a) for e, a in zip(reference, batch_results)])
+        ),
+        "compact": float(
+            np.mean([top_n_overlap(e, a) for e, a in zip(reference, compact_results)])
+        ),
+    }
+
+    if ann:
+        _, result["ann_build_s"] = _timed(model.build_ann, **(ann_options or {}))
+        result["ann_options"] = ann_options
+        # Партиции с IVF; при 0 приближенный поиск не включился
+        result["ann_partitions"] = len(model.ann.indexes) if model.ann else 0
+        latencies = []
+        ann_results = []
+        for query in query_list:
+            recommendations, elapsed = _timed(
+                model.recommend_reports, *query, top_n=top_n
+            )
+            ann_results.append(recommendations)
+            latencies.append(elapsed)
+        result["ann_single_query"] = _percentiles(latencies)
+        result["ann_recall"] = model.ann_recall(top_n=top_n)
+        result["overlap"]["ann"] = float(
+            np.mean([top_n_overlap(e, a) for e, a in zip(reference, ann_results)])
+        )
+
+    result["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--reference-queries", type=int, default=50)
+    parser.add_argument("--top-n", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ann", action="store_true", help="Замерить режим ANN")
+    # Значения по умолчанию совпадают с RECOMMENDATION_ANN_OPTIONS
+    parser.add_argument(
+        "--min-partition-size",
+        type=int,
+        default=20000,
+        help="Наименьший размер партиции, для которой строится IVF",
+    )
+    parser.add_argument(
+        "--n-probe", type=int, default=64, help="Число просматриваемых кластеров"
+    )
+    parser.add_argument(
+        "--n-components", type=int, default=128, help="Размерность SVD-проекции"
+    )
+    parser.add_argument(
+        "--rerank", type=int, default=1000, help="Число кандидатов для точной оценки"
+    )
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    args = parser.parse_args(argv)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "results": [
+            run_benchmark(
+                size,
+                queries=args.queries,
+                batch_size=args.batch_size,
+                reference_queries=args.reference_queries,
+                top_n=args.top_n,
+                seed=args.seed,
+                ann=args.ann,
+                ann_options={
+                    "n_components": args.n_components,
+                    "n_probe": args.n_probe,
+                    "rerank": args.rerank,
+                    "min_partition_size": args.min_partition_size,
+                },
+            )
+            for size in args.sizes
+        ],
+    }
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output)
+    else:
+        print(output)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,177 @@
+import os
+
+import numpy as np
 import pandas as pd
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.preprocessing import StandardScaler
 import joblib
+from model.ann import ANNIndex
 from mysite.settings import BASE_DIR
 
+UNSUITABLE_QUALITY = "Не подходит по критериям"
+# Версия формата компактного артефакта (каталог с .npy файлами)
+COMPACT_FORMAT = 1
+QUALITY_COLUMNS = ["diagnostic_data", "was_done", "result", "name_component"]
+TEXT_COLUMNS = ["type_object", "description", "type_breaking", "text_report"]
+
+
+def build_text_features(df, columns=TEXT_COLUMNS):
+    """
+    Склейка текстовых признаков векторными операциями над столбцами
+    """
+    features = df[columns[0]].astype(str).fillna("nan")
+    for column in columns[1:]:
+        features = features + " " + df[column].astype(str).fillna("nan")
+    return features
+
+
+class ReportPartition:
+    """
+    Часть индекса для одного type_object без неподходящих отчетов
+    """
+
+    def __init__(self, row_ids, matrix, quality_scores, texts, task_ids=None):
+        # Номера строк в DataFrame, из которого построена партиция
+        self.row_ids = row_ids
+        # Строки tfidf_matrix в формате CSR
+        self.matrix = matrix
+        self.quality_scores = quality_scores
+        self.texts = texts
+        # Задачи, из которых взяты отчеты; -1 - отчет из исходного набора
+        if task_ids is None:
+            task_ids = np.full(len(row_ids), -1, dtype=np.int64)
+        self.task_ids = task_ids
+
+    def __len__(self):
+        return len(self.row_ids)
+
+
+class _ChainedTexts:
+    """
+    Тексты отчетов нескольких партиций с общей нумерацией
+    """
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.offsets = np.cumsum([len(texts) for texts in parts])
+
+    def __getitem__(self, position):
+        index = int(np.searchsorted(self.offsets, position, side="right"))
+        start = self.offsets[index - 1] if index else 0
+        return self.parts[index][position - start]
+
+
+class _SubsetTexts:
+    """
+    Тексты отчетов по списку позиций в партиции
+    """
+
+    def __init__(self, texts, positions):
+        self.texts = texts
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, position):
+        return self.texts[self.positions[position]]
+
+
+class OffsetTexts:
+    """
+    Тексты отчетов из общего буфера UTF-8 с таблицей смещений.
+
+    Буфер и смещения могут быть отображены в память, тогда строки
+    декодируются только при обращении к ним.
+    """
+
+    def __init__(self, buffer, offsets, start=0, stop=None):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.start = start
+        self.stop = len(offsets) - 1 if stop is None else stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, position):
+        row = self.start + int(position)
+        begin, end = self.offsets[row], self.offsets[row + 1]
+        return bytes(self.buffer[begin:end]).decode("utf-8")
+
+
+def task_id_array(df):
+    if "task_id" not in df:
+        return np.full(len(df), -1, dtype=np.int64)
+    return df["task_id"].fillna(-1).to_numpy(dtype=np.int64)
+
+
+def build_partitions(df, tfidf_matrix, only=None):
+    """
+    Разбиение tfidf_matrix на партиции по type_object
+
+    only - множество type_object, для которых строятся партиции (по
+    умолчанию все)
+    """
+    suitable = (df["quality_report"] != UNSUITABLE_QUALITY).to_numpy()
+    type_objects = df["type_object"].to_numpy()
+    quality_scores = df["quality_score"].to_numpy(dtype=np.float64)
+    text_reports = df["text_report"].to_numpy()
+    task_ids = task_id_array(df)
+    tfidf_matrix = tfidf_matrix.tocsr()
+
+    partitions = {}
+    for type_object in pd.unique(type_objects[suitable]):
+        if only is not None and type_object not in only:
+            continue
+        row_ids = np.flatnonzero((type_objects == type_object) & suitable)
+        partitions[type_object] = ReportPartition(
+            row_ids=row_ids,
+            matrix=tfidf_matrix[row_ids],
+            quality_scores=quality_scores[row_ids],
+            texts=text_reports[row_ids],
+            task_ids=task_ids[row_ids],
+        )
+    return partitions
+
 
 class ReportRecommendationModel:
     def __init__(self):
+        self.version = None
+        # Момент начала чтения отчетов задач при сборке; более поздние
+        # изменения отчетов добавляются дельтой
+        self.built_at = None
         self.df = None
         self.tfidf_vectorizer = None
         self.tfidf_matrix = None
         self.scaler = None
+        self.partitions = {}
+        # Отчеты, добавленные после обучения, до ближайшей перестройки
+        self.delta = None
+        self.delta_matrix = None
+        self.delta_partitions = {}
+        # Задачи, отчеты которых в исходном корпусе устарели (изменены или
+        # удалены после обучения), и позиции этих отчетов в партициях
+        self.replaced_task_ids = set()
+        self.hidden = {}
+        # Индекс приближенного поиска, строится методом build_ann
+        self.ann = None
 
     def load_data(self, csv_path):
         """
         Загрузка и предобработка данных
         """
-        self.df = pd.read_excel(csv_path)
+        self.fit(pd.read_excel(csv_path))
+
+    def fit(self, df):
+        """
+        Обучение модели на DataFrame с отчетами
+        """
+        self.df = df.reset_index(drop=True)
 
         # Преобразование текстовых признаков
-        self.df["text_features"] = self.df.apply(
-            lambda row: f"{row['type_object']} {row['description']} {row['type_breaking']} {row['text_report']}",
-            axis=1,
-        )
+        self.df["text_features"] = build_text_features(self.df)
 
         # Векторизация текста
         self.tfidf_vectorizer = TfidfVectorizer(stop_words=None)
@@ -32,45 +180,327 @@ class ReportRecommendationModel:
         )
 
         # Нормализация критериев качества
-        quality_columns = ["diagnostic_data", "was_done", "result", "name_component"]
         self.scaler = StandardScaler()
         self.df["quality_score"] = self.scaler.fit_transform(
-            self.df[quality_columns]
+            self.df[QUALITY_COLUMNS]
         ).sum(axis=1)
 
+        self._build_index()
+
+    def _build_index(self):
+        self.partitions = build_partitions(self.df, self.tfidf_matrix)
+
+    def set_delta(self, df):
+        """
+        Замена дополнительных отчетов, добавленных после обучения
+        """
+        self.update_delta(df, replace=True)
+
+    def update_delta(self, df=None, removed=(), replace=False):
+        """
+        Добавление или замена отчетов, пришедших после обучения.
+
+        Векторизуются только переданные отчеты, уже обученным словарем и без
+        переобучения модели. Отчеты дельты с тем же task_id, а также с task_id
+        из removed удаляются; отчеты этих задач из исходного корпуса больше
+        не выдаются. Пересобираются только партиции затронутых type_object.
+        replace=True заменяет всю дельту.
+        """
+        delta, matrix = self.delta, self.delta_matrix
+        partitions = dict(self.delta_partitions)
+        replaced_task_ids = set() if replace else set(self.replaced_task_ids)
+        replaced_task_ids.update(int(task_id) for task_id in removed)
+        affected = set()
+        if replace:
+            affected.update(partitions)
+            delta = matrix = None
+
+        if df is not None and not df.empty:
+            df = df.reset_index(drop=True)
+            df["text_features"] = build_text_features(df)
+            df["quality_score"] = self.scaler.transform(df[QUALITY_COLUMNS]).sum(
+                axis=1
+            )
+            if "task_id" in df:
+                replaced_task_ids.update(int(task_id) for task_id in df["task_id"])
+                removed = set(removed) | set(df["task_id"])
+
+        if delta is not None and removed and "task_id" in delta:
+            dropped = delta["task_id"].isin(removed).to_numpy()
+            if dropped.any():
+                affected.update(delta["type_object"][dropped])
+                kept = np.flatnonzero(~dropped)
+                delta = delta.iloc[kept].reset_index(drop=True)
+                matrix = matrix[kept]
+
+        if df is not None and not df.empty:
+            added = self.tfidf_vectorizer.transform(df["text_features"]).tocsr()
+            affected.update(df["type_object"])
+            if delta is None or delta.empty:
+                delta, matrix = df, added
+            else:
+                delta = pd.concat([delta, df], ignore_index=True)
+                matrix = sparse.vstack([matrix, added], format="csr")
+
+        for type_object in affected:
+            partitions.pop(type_object, None)
+        if delta is not None and not delta.empty:
+            partitions.update(build_partitions(delta, matrix, only=affected))
+        else:
+            delta = matrix = None
+
+        hidden = self._hidden_positions(replaced_task_ids)
+
+        # Партиции заменяются целиком, чтобы читатели видели согласованное состояние
+        self.delta_partitions = partitions
+        self.hidden = hidden
+        self.replaced_task_ids = replaced_task_ids
+        self.delta = delta
+        self.delta_matrix = matrix
+
+    def delta_rows(self):
+        """
+        Отчеты дельты по task_id в исходном виде, без вычисленных столбцов
+        """
+        if self.delta is None or "task_id" not in self.delta:
+            return {}
+        columns = self.delta.columns.drop(["text_features", "quality_score"])
+        return {
+            int(row["task_id"]): row
+            for row in self.delta[columns].to_dict("records")
+        }
+
+    def _hidden_positions(self, task_ids):
+        """
+        Позиции отчетов задач task_ids в партициях исходного корпуса
+        """
+        if not task_ids:
+            return {}
+        task_ids = np.fromiter(task_ids, dtype=np.int64, count=len(task_ids))
+        hidden = {}
+        for type_object, partition in self.partitions.items():
+            positions = np.flatnonzero(np.isin(partition.task_ids, task_ids))
+            if len(positions):
+                hidden[type_object] = positions
+        return hidden
+
+    def rebuild(self, delta=None, replace_tasks=False):
+        """
+        Новая модель, обученная на исходном корпусе вместе с добавленными отчетами
+
+        delta - добавляемые отчеты, по умолчанию текущая дельта модели.
+        replace_tasks - delta содержит отчеты всех задач: отчеты задач из
+        исходного корпуса заменяются ею целиком.
+        """
+        if not self.can_rebuild:
+            raise ValueError("Model loaded from a compact artifact cannot be rebuilt")
+
+        df = self.df
+        if replace_tasks and "task_id" in df:
+            df = df[df["task_id"].isna()]
+        if delta is None:
+            delta = self.delta
+        if delta is not None and not delta.empty:
+            df = pd.concat([df, delta], ignore_index=True)
+            # Для задач из базы остается только последняя версия отчета
+            if "task_id" in df:
+                df = df[df["task_id"].isna() | ~df["task_id"].duplicated(keep="last")]
+        df = df.drop(columns=["text_features", "quality_score"], errors="ignore")
+
+        model = ReportRecommendationModel()
+        model.fit(df)
+        return model
+
     def recommend_reports(self, type_object, description, type_breaking, top_n=3):
         """
         Рекомендация наиболее подходящих отчетов
         """
-        # Создание входного вектора
-        input_feature = f"{type_object} {description} {type_breaking}"
-        input_vector = self.tfidf_vectorizer.transform([input_feature])
+        return self.recommend_reports_batch(
+            [(type_object, description, type_breaking)], top_n=top_n
+        )[0]
+
+    def recommend_reports_batch(self, queries, top_n=3, exact=False):
+        """
+        Рекомендация отчетов сразу для нескольких запросов
 
-        # Вычисление косинусного сходства
-        similarities = cosine_similarity(input_vector, self.tfidf_matrix)[0]
+        queries - последовательность кортежей (type_object, description, type_breaking).
+        Запросы векторизуются одной матрицей на type_object, сходство
+        считается одним разреженным матричным произведением с партицией.
+        Если построен индекс build_ann и exact=False, крупные партиции
+        просматриваются приближенно.
+        """
+        queries = [tuple(str(value) for value in query) for query in queries]
+        if not queries:
+            return []
 
-        # Фильтрация и ранжирование
+        # Одинаковые запросы считаем один раз
+        unique_queries = list(dict.fromkeys(queries))
 
-        filtered_df = self.df[
-            (self.df["type_object"] == type_object)
-            & (self.df["quality_report"] != "Не подходит по критериям")
-        ]
+        # Запросы группируются по type_object: каждая группа сравнивается
+        # только со своей партицией
+        groups = {}
+        for query in unique_queries:
+            groups.setdefault(query[0], []).append(query)
 
-        filtered_df["similarity"] = similarities[filtered_df.index]
-        filtered_df["final_score"] = (
-            filtered_df["similarity"] * 0.6 + filtered_df["quality_score"] * 0.4
-        )
+        results = {}
+        for type_object, group in groups.items():
+            main = self.partitions.get(type_object)
+            ann = None
+            if self.ann is not None and not exact and main is not None:
+                ann = self.ann.get(type_object)
+
+            partitions = [
+                partition
+                for partition in (main, self.delta_partitions.get(type_object))
+                if partition is not None and len(partition)
+            ]
+            if not partitions:
+                results.update((query, []) for query in group)
+                continue
+            exact_partitions = [
+                partition
+                for partition in partitions
+                if ann is None or partition is not main
+            ]
+
+            # Создание входных векторов
+            input_features = [
+                f"{type_object} {description} {type_breaking}"
+                for type_object, description, type_breaking in group
+            ]
+            input_matrix = self.tfidf_vectorizer.transform(input_features)
+
+            # Устаревшие отчеты исходного корпуса, замененные дельтой
+            hidden = self.hidden.get(type_object)
+
+            # Строки TF-IDF нормированы по L2, поэтому скалярное произведение
+            # совпадает с косинусным сходством
+            if exact_partitions:
+                scores = []
+                for partition in exact_partitions:
+                    partition_scores = (
+                        input_matrix @ partition.matrix.T
+                    ).toarray() * 0.6 + partition.quality_scores * 0.4
+                    if partition is main and hidden is not None:
+                        partition_scores[:, hidden] = -np.inf
+                    scores.append(partition_scores)
+                exact_scores = np.hstack(scores)
+            exact_texts = [partition.texts for partition in exact_partitions]
+
+            if ann is None:
+                if len(exact_texts) == 1:
+                    texts = exact_texts[0]
+                else:
+                    texts = _ChainedTexts(exact_texts)
+                for row, query in enumerate(group):
+                    results[query] = self._top_reports(
+                        texts, exact_scores[row], top_n
+                    )
+                continue
+
+            query_embeddings = self.ann.embed(input_matrix)
+            for row, query in enumerate(group):
+                positions, ann_scores = ann.search(
+                    query_embeddings[row], input_matrix[row], main, top_n
+                )
+                if hidden is not None:
+                    visible = ~np.isin(positions, hidden)
+                    positions, ann_scores = positions[visible], ann_scores[visible]
+                final_scores = [ann_scores]
+                if exact_partitions:
+                    final_scores.append(exact_scores[row])
+                texts = _ChainedTexts([_SubsetTexts(main.texts, positions)] + exact_texts)
+                results[query] = self._top_reports(
+                    texts, np.concatenate(final_scores), top_n
+                )
+
+        return [results[query] for query in queries]
+
+    def build_ann(self, **params):
+        """
+        Построение индекса приближенного поиска для основных партиций.
+
+        Параметры передаются в ANNIndex.
+        """
+        self.ann = ANNIndex(self.partitions, **params) if self.partitions else None
+        return self.ann
+
+    def ann_recall(self, sample_size=200, top_n=3, seed=0):
+        """
+        Доля отчетов точного поиска, найденных приближенным поиском.
+
+        Запросами служат случайные строки партиций с IVF-индексом.
+        """
+        if self.ann is None or not self.ann.indexes:
+            return None
+
+        rng = np.random.default_rng(seed)
+        found = total = 0
+        type_objects = list(self.ann.indexes)
+        for type_object in rng.choice(type_objects, sample_size):
+            partition = self.partitions[type_object]
+            row = int(rng.integers(len(partition)))
+            query_vector = partition.matrix[row]
+
+            final_scores = (
+                (partition.matrix @ query_vector.T).toarray().ravel() * 0.6
+                + partition.quality_scores * 0.4
+            )
+            count = min(top_n, len(final_scores))
+            expected = np.argpartition(-final_scores, count - 1)[:count]
 
-        # Топ-3 рекомендации
-        recommendations = filtered_df.nlargest(top_n, "final_score")
+            positions, ann_scores = self.ann.get(type_object).search(
+                self.ann.embed(query_vector)[0], query_vector, partition, top_n
+            )
+            got = positions[np.argsort(-ann_scores, kind="stable")[:count]]
 
-        return recommendations[["text_report", "final_score"]].to_dict("records")
+            # Равные оценки считаются совпадением
+            threshold = final_scores[expected].min()
+            found += min(count, int(np.sum(final_scores[got] >= threshold)))
+            total += count
+
+        return found / total if total else None
+
+    def _top_reports(self, texts, final_scores, top_n):
+        """
+        Выбор top_n отчетов по итоговой оценке; отчеты с оценкой -inf
+        исключены
+        """
+        count = min(top_n, int(np.isfinite(final_scores).sum()))
+        if count <= 0:
+            return []
+
+        if count < len(final_scores):
+            # Оценка top_n-го элемента; все строки не хуже нее - кандидаты
+            kth = np.argpartition(final_scores, -count)[-count]
+            candidates = np.flatnonzero(final_scores >= final_scores[kth])
+        else:
+            candidates = np.arange(len(final_scores))
+
+        # При равных оценках сохраняется исходный порядок строк, как в nlargest
+        order = candidates[np.lexsort((candidates, -final_scores[candidates]))]
+        order = order[:count]
+
+        return [
+            {
+                "text_report": texts[position],
+                "final_score": float(final_scores[position]),
+            }
+            for position in order
+        ]
+
+    @property
+    def can_rebuild(self):
+        # Компактный артефакт не содержит исходного корпуса
+        return self.df is not None
 
     def save_model(self, path=f"{BASE_DIR}/model/report_recommendation_model.joblib"):
         """
         Сохранение модели для использования в PWA
         """
         model_data = {
+            "version": self.version,
+            "built_at": self.built_at,
             "tfidf_vectorizer": self.tfidf_vectorizer,
             "tfidf_matrix": self.tfidf_matrix,
             "scaler": self.scaler,
@@ -82,11 +512,123 @@ class ReportRecommendationModel:
         """
         Загрузка предобученной модели
         """
+        if os.path.isdir(path):
+            self.load_compact(path)
+            return
+
         model_data = joblib.load(path)
+        self.version = model_data.get("version")
+        self.built_at = model_data.get("built_at")
         self.tfidf_vectorizer = model_data["tfidf_vectorizer"]
         self.tfidf_matrix = model_data["tfidf_matrix"]
         self.scaler = model_data["scaler"]
         self.df = model_data["df"]
+        self._build_index()
+
+    def save_compact(self, path):
+        """
+        Сохранение модели в компактном формате.
+
+        В каталог пишутся только подходящие отчеты, упорядоченные по
+        type_object: массивы CSR и оценки качества в .npy, тексты отчетов
+        в reports.bin с таблицей смещений. Такой артефакт открывается через
+        mmap, и воркеры разделяют его страницы через кэш ОС.
+        """
+        os.makedirs(path, exist_ok=True)
+
+        row_ids = []
+        partitions = {}
+        for type_object, partition in self.partitions.items():
+            start = sum(len(ids) for ids in row_ids)
+            row_ids.append(partition.row_ids)
+            partitions[type_object] = (start, start + len(partition))
+        row_ids = np.concatenate(row_ids) if row_ids else np.array([], dtype=np.int64)
+
+        matrix = self.tfidf_matrix.tocsr()[row_ids]
+        quality_scores = self.df["quality_score"].to_numpy(dtype=np.float64)[row_ids]
+        task_ids = task_id_array(self.df)[row_ids]
+        texts = [
+            str(text).encode("utf-8")
+            for text in self.df["text_report"].to_numpy()[row_ids]
+        ]
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in texts], out=offsets[1:])
+
+        np.save(os.path.join(path, "data.npy"), matrix.data)
+        np.save(os.path.join(path, "indices.npy"), matrix.indices)
+        np.save(os.path.join(path, "indptr.npy"), matrix.indptr)
+        np.save(os.path.join(path, "quality_score.npy"), quality_scores)
+        np.save(os.path.join(path, "task_ids.npy"), task_ids)
+        np.save(os.path.join(path, "reports_offsets.npy"), offsets)
+        with open(os.path.join(path, "reports.bin"), "wb") as file:
+            for text in texts:
+                file.write(text)
+
+        # Метаданные пишутся последними: по ним артефакт считается готовым
+        joblib.dump(
+            {
+                "format": COMPACT_FORMAT,
+                "version": self.version,
+                "built_at": self.built_at,
+                "tfidf_vectorizer": self.tfidf_vectorizer,
+                "scaler": self.scaler,
+                "n_features": matrix.shape[1],
+                "partitions": partitions,
+            },
+            os.path.join(path, "meta.joblib"),
+        )
+
+    def load_compact(self, path, mmap_mode="r"):
+        """
+        Загрузка компактного артефакта без чтения массивов в память
+        """
+        meta = joblib.load(os.path.join(path, "meta.joblib"))
+        if meta["format"] != COMPACT_FORMAT:
+            raise ValueError(f"Unsupported compact artifact format: {meta['format']}")
+
+        def load(name):
+            return np.load(os.path.join(path, name), mmap_mode=mmap_mode)
+
+        data = load("data.npy")
+        indices = load("indices.npy")
+        indptr = load("indptr.npy")
+        quality_scores = load("quality_score.npy")
+        offsets = load("reports_offsets.npy")
+        # В артефактах, собранных до появления task_ids.npy, задач нет
+        task_ids = None
+        if os.path.exists(os.path.join(path, "task_ids.npy")):
+            task_ids = load("task_ids.npy")
+        reports_path = os.path.join(path, "reports.bin")
+        if os.path.getsize(reports_path):
+            buffer = np.memmap(reports_path, dtype=np.uint8, mode="r")
+        else:
+            buffer = np.zeros(0, dtype=np.uint8)
+
+        self.version = meta["version"]
+        self.built_at = meta.get("built_at")
+        self.tfidf_vectorizer = meta["tfidf_vectorizer"]
+        self.scaler = meta["scaler"]
+        self.df = None
+        self.tfidf_matrix = None
+        self.partitions = {}
+        for type_object, (start, stop) in meta["partitions"].items():
+            begin, end = indptr[start], indptr[stop]
+            matrix = sparse.csr_matrix(
+                (
+                    data[begin:end],
+                    indices[begin:end],
+                    np.asarray(indptr[start : stop + 1]) - begin,
+                ),
+                shape=(stop - start, meta["n_features"]),
+                copy=False,
+            )
+            self.partitions[type_object] = ReportPartition(
+                row_ids=np.arange(start, stop),
+                matrix=matrix,
+                quality_scores=quality_scores[start:stop],
+                texts=OffsetTexts(buffer, offsets, start, stop),
+                task_ids=None if task_ids is None else task_ids[start:stop],
+            )
 
 
 # Функция для демонстрации и тестирования
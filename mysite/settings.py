@@ -39,6 +39,7 @@ SECURE_SSL_REDIRECT = False
 # Application definition
 
 INSTALLED_APPS = [
+    "daphne",
     "corsheaders",
     "django.contrib.admin",
     "django.contrib.auth",
@@ -56,7 +57,7 @@ INSTALLED_APPS = [
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         # 'rest_framework.authentication.SessionAuthentication',
-        "rest_framework.authentication.TokenAuthentication",
+        "its_regions_2025.authentication.CachedTokenAuthentication",
     ],
     # 'DEFAULT_PERMISSION_CLASSES': [
     #     'rest_framework.permissions.IsAuthenticated',
@@ -94,6 +95,23 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "mysite.wsgi.application"
+ASGI_APPLICATION = "mysite.asgi.application"
+
+# Канальный слой для WebSocket-событий. Слой в памяти работает только в
+# пределах одного процесса; при нескольких процессах нужен Redis
+# (CHANNEL_REDIS_URL, пакет channels-redis). Уведомления рассылает отдельный
+# процесс dispatch_notifications, поэтому без Redis он не запускается.
+if os.getenv("CHANNEL_REDIS_URL"):
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [os.getenv("CHANNEL_REDIS_URL")]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+    }
 
 
 # Database
@@ -156,3 +174,73 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 AUTH_USER_MODEL = "its_regions_2025.User"
 
 LANGUAGE_CODE = "ru"
+
+# Recommendation model
+RECOMMENDATION_MODEL_PATH = BASE_DIR / "model" / "report_recommendation_model.joblib"
+# Символьная ссылка на артефакт, собранный командой build_recommendation_index;
+# если ее нет, используется RECOMMENDATION_MODEL_PATH
+RECOMMENDATION_ACTIVE_PATH = Path(
+    os.getenv("RECOMMENDATION_ACTIVE_PATH", BASE_DIR / "model" / "active")
+)
+# Загружать модель при старте приложения, а не при первом запросе
+RECOMMENDATION_PRELOAD = os.getenv("RECOMMENDATION_PRELOAD", "0") == "1"
+# Кэш результатов рекомендаций: размер и время жизни записей в процессе,
+# а также необязательный алиас кэша Django, общего для всех воркеров
+RECOMMENDATION_CACHE_SIZE = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "1024"))
+RECOMMENDATION_CACHE_TTL = int(os.getenv("RECOMMENDATION_CACHE_TTL", "3600"))
+RECOMMENDATION_CACHE_ALIAS = os.getenv("RECOMMENDATION_CACHE_ALIAS") or None
+# Период фоновой перестройки индекса рекомендаций в секундах (0 - отключена)
+RECOMMENDATION_REBUILD_INTERVAL = int(
+    os.getenv("RECOMMENDATION_REBUILD_INTERVAL", "600")
+)
+# Период чтения из базы отчетов задач, измененных после сборки модели,
+# в секундах (0 - отключено)
+RECOMMENDATION_SYNC_INTERVAL = int(os.getenv("RECOMMENDATION_SYNC_INTERVAL", "30"))
+# Наибольшее число добавленных отчетов для модели из компактного артефакта,
+# которая не перестраивается; старые отчеты вытесняются
+RECOMMENDATION_DELTA_LIMIT = int(os.getenv("RECOMMENDATION_DELTA_LIMIT", "5000"))
+# Пул процессов асинхронного API рекомендаций: число процессов и
+# количество запросов в очереди, сверх которого отвечаем 503
+RECOMMENDATION_POOL_WORKERS = int(os.getenv("RECOMMENDATION_POOL_WORKERS", "2"))
+RECOMMENDATION_POOL_QUEUE = int(os.getenv("RECOMMENDATION_POOL_QUEUE", "16"))
+# Приближенный поиск (SVD + IVF) для крупных партиций корпуса отчетов.
+# Параметры подобраны python -m model.benchmark (см. model/benchmark.py)
+RECOMMENDATION_ANN = os.getenv("RECOMMENDATION_ANN", "0") == "1"
+RECOMMENDATION_ANN_OPTIONS = {
+    "n_components": 128,
+    "n_probe": 64,
+    "rerank": 1000,
+    "min_partition_size": 20000,
+}
+
+# Разностная синхронизация /api/v1/allData/: запас курсора в секундах
+SYNC_CURSOR_OVERLAP_SECONDS = int(os.getenv("SYNC_CURSOR_OVERLAP_SECONDS", "5"))
+# Размер порции строк при потоковой выдаче /api/v1/allData/?stream=1
+SYNC_STREAM_CHUNK_SIZE = int(os.getenv("SYNC_STREAM_CHUNK_SIZE", "500"))
+# Кэш справочников (типы объектов, приоритеты, статусы, типы поломок и оценок).
+# При нескольких процессах нужен общий кэш, иначе инвалидация видна только
+# процессу, изменившему справочник. Если кэш локален для процесса (LocMem,
+# как "default" без настройки CACHES), записи живут REFERENCE_CACHE_LOCAL_TTL
+# секунд: остальные процессы видят изменения с этой задержкой.
+REFERENCE_CACHE_ALIAS = os.getenv("REFERENCE_CACHE_ALIAS", "default")
+REFERENCE_CACHE_TTL = int(os.getenv("REFERENCE_CACHE_TTL", "3600"))
+REFERENCE_CACHE_LOCAL_TTL = int(os.getenv("REFERENCE_CACHE_LOCAL_TTL", "10"))
+# Каждое N-е изменение задачи сохраняет в истории полный снимок
+TASK_HISTORY_SNAPSHOT_INTERVAL = int(os.getenv("TASK_HISTORY_SNAPSHOT_INTERVAL", "20"))
+# Рассылка уведомлений из очереди: отдельный процесс рядом с daphne,
+# python manage.py dispatch_notifications --loop (нужен CHANNEL_REDIS_URL)
+NOTIFICATION_DISPATCH_BATCH_SIZE = int(
+    os.getenv("NOTIFICATION_DISPATCH_BATCH_SIZE", "500")
+)
+NOTIFICATION_DISPATCH_INTERVAL = float(os.getenv("NOTIFICATION_DISPATCH_INTERVAL", "5"))
+# Сроки хранения (python manage.py apply_retention); значения по умолчанию
+# в its_regions_2025.retention.DEFAULT_POLICIES, days=None отключает политику
+RETENTION_POLICIES = {}
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))
+RETENTION_ARCHIVE_DIR = Path(os.getenv("RETENTION_ARCHIVE_DIR", BASE_DIR / "archive"))
+# Кэш токенов аутентификации: размер LRU процесса и время жизни записи.
+# При TOKEN_CACHE_ALIAS используется общий кэш Django, тогда выход и
+# изменение пользователя сразу видны всем процессам.
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", "60"))
+TOKEN_CACHE_ALIAS = os.getenv("TOKEN_CACHE_ALIAS") or None
@@ -29,6 +29,7 @@ from its_regions_2025.views import (
     LogoutViewSet,
     RegistrationViewSet,
     AllDataViewSet,
+    AsyncRecommendationView,
     index,
 )
 
@@ -41,6 +42,11 @@ urlpatterns = [
     path("api/v1/register/", RegistrationViewSet.as_view(), name="register"),
     path("api/v1/logout/", LogoutViewSet.as_view(), name="logout"),
     path("api/v1/allData/", AllDataViewSet.as_view(), name="all-data"),
+    path(
+        "api/v1/async/recommendations/<int:pk>/",
+        AsyncRecommendationView.as_view(),
+        name="async-recommendation",
+    ),
     path("api/v1/data/", include("its_regions_2025.urls"), name="api"),
     # Yaml openapi
     path("api/v1/openapi/", SpectacularAPIView.as_view(), name="schema"),